@@ -132,7 +132,8 @@ class ProfileForm(forms.ModelForm):
 
     class Meta:
         model = User
-        fields = ('nombre', 'apellido', 'notificaciones')
+        fields = ('nombre', 'apellido', 'notificaciones', 'deportes_notificacion', 'hora_desde_notificacion',
+                  'hora_hasta_notificacion')
         widgets = {
             'nombre': forms.TextInput(attrs={'placeholder': 'Ingrese su nombre',
                                              'class': 'form-control',
@@ -143,6 +144,11 @@ class ProfileForm(forms.ModelForm):
                                                'autocomplete': 'off',
                                                }),
             'notificaciones': forms.CheckboxInput(),
+            'deportes_notificacion': forms.CheckboxSelectMultiple(),
+            'hora_desde_notificacion': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'},
+                                                       format='%H:%M'),
+            'hora_hasta_notificacion': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'},
+                                                       format='%H:%M'),
         }
 
 
@@ -0,0 +1,39 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0003_alter_historicalreserva_fecha_alter_reserva_fecha'),
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicaluser',
+            name='hora_desde_notificacion',
+            field=models.TimeField(blank=True, help_text='Horario a partir del cual interesan las canchas liberadas.', null=True, verbose_name='Avisar desde las'),
+        ),
+        migrations.AddField(
+            model_name='historicaluser',
+            name='hora_hasta_notificacion',
+            field=models.TimeField(blank=True, help_text='Horario hasta el cual interesan las canchas liberadas.', null=True, verbose_name='Avisar hasta las'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='deportes_notificacion',
+            field=models.ManyToManyField(blank=True, help_text='Solo se avisará de canchas liberadas de estos deportes. Si no se elige ninguno, se avisará de todos.', to='reservas.deporte', verbose_name='Deportes de interés'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='hora_desde_notificacion',
+            field=models.TimeField(blank=True, help_text='Horario a partir del cual interesan las canchas liberadas.', null=True, verbose_name='Avisar desde las'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='hora_hasta_notificacion',
+            field=models.TimeField(blank=True, help_text='Horario hasta el cual interesan las canchas liberadas.', null=True, verbose_name='Avisar hasta las'),
+        ),
+    ]
@@ -57,6 +57,14 @@ class User(AbstractUser):
     notificaciones = models.BooleanField(default=False, verbose_name='Notificaciones',
                                          help_text='Recibir notificaciones por email sobre eventos, '
                                                    'canchas liberadas, entre otros.')
+    deportes_notificacion = models.ManyToManyField('reservas.Deporte', blank=True,
+                                                   verbose_name='Deportes de interés',
+                                                   help_text='Solo se avisará de canchas liberadas de estos deportes. '
+                                                             'Si no se elige ninguno, se avisará de todos.')
+    hora_desde_notificacion = models.TimeField(null=True, blank=True, verbose_name='Avisar desde las',
+                                               help_text='Horario a partir del cual interesan las canchas liberadas.')
+    hora_hasta_notificacion = models.TimeField(null=True, blank=True, verbose_name='Avisar hasta las',
+                                               help_text='Horario hasta el cual interesan las canchas liberadas.')
     history = HistoricalRecords()
 
     USERNAME_FIELD = 'email'
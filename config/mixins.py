@@ -1,4 +1,6 @@
 from django.contrib.auth.mixins import AccessMixin
+from django.db.models import Q
+from django.http import JsonResponse
 
 
 class AdminRequiredMixin(AccessMixin):
@@ -14,3 +16,77 @@ class AdminRequiredMixin(AccessMixin):
         except AttributeError:
             return self.handle_no_permission()
         return super().dispatch(request, *args, **kwargs)
+
+
+class DataTableMixin:
+    """
+    CBV mixin, que responde a las peticiones server-side de DataTables. El paginado, el orden y la búsqueda se
+    resuelven en la base de datos y solo se proyectan los campos de datatable_values.
+    Las peticiones GET sin el parámetro draw se atienden normalmente (render del template).
+    """
+    # Campos que se proyectan con values().
+    datatable_values = []
+    # Campos en los que se busca el texto ingresado (icontains).
+    datatable_search_fields = []
+    # Columna de la tabla (atributo data de DataTables) -> campo o campos de la base de datos para ordenar.
+    datatable_order_fields = {}
+    # Orden por defecto.
+    datatable_default_order = []
+    datatable_max_length = 100
+
+    def get_datatable_queryset(self):
+        """Devuelve el queryset sobre el que se pagina, ordena y busca."""
+        return self.get_queryset()
+
+    def get_datatable_row(self, row):
+        """Permite completar una fila (diccionario de values()) con campos calculados."""
+        return row
+
+    def get_datatable_order(self, params):
+        """Traduce el orden pedido por DataTables a campos de la base de datos."""
+        order = []
+        i = 0
+        while 'order[{}][column]'.format(i) in params:
+            column = params.get('columns[{}][data]'.format(params['order[{}][column]'.format(i)]))
+            descending = params.get('order[{}][dir]'.format(i)) == 'desc'
+            fields = self.datatable_order_fields.get(column, ())
+            for field in [fields] if isinstance(fields, str) else fields:
+                if descending:
+                    field = field[1:] if field.startswith('-') else '-' + field
+                order.append(field)
+            i += 1
+        return order or self.datatable_default_order
+
+    def get_datatable_data(self, params):
+        """Devuelve la página pedida en el formato de respuesta de DataTables."""
+        queryset = self.get_datatable_queryset()
+        total = queryset.count()
+        filtered = total
+        search = params.get('search[value]', '').strip()
+        if search and self.datatable_search_fields:
+            q = Q()
+            for field in self.datatable_search_fields:
+                q |= Q(**{field + '__icontains': search})
+            queryset = queryset.filter(q)
+            filtered = queryset.count()
+        start = max(int(params.get('start', 0)), 0)
+        length = int(params.get('length', 10))
+        length = self.datatable_max_length if length < 0 else min(length, self.datatable_max_length)
+        queryset = queryset.order_by(*self.get_datatable_order(params))
+        rows = queryset.values(*self.datatable_values)[start:start + length]
+        return {
+            'draw': int(params['draw']),
+            'recordsTotal': total,
+            'recordsFiltered': filtered,
+            'data': [self.get_datatable_row(row) for row in rows],
+        }
+
+    def get(self, request, *args, **kwargs):
+        if 'draw' not in request.GET:
+            return super().get(request, *args, **kwargs)
+        data = {}
+        try:
+            data = self.get_datatable_data(request.GET)
+        except Exception as e:
+            data['error'] = e.args[0]
+        return JsonResponse(data, safe=False)
@@ -92,6 +92,22 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Caché compartida por todos los procesos del servidor (versiones de los parámetros, categorías y tarjetas de eventos,
+# y datos de las imágenes, una entrada por imagen). Al superar MAX_ENTRIES se borra un tercio de las entradas al azar,
+# por lo que el límite debe quedar muy por encima de la cantidad de imágenes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    }
+}
+
 FIXTURE_DIRS = [
     BASE_DIR / 'fixtures',
 ]
@@ -137,6 +153,9 @@ STATICFILES_DIRS = [
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
 
+# Url base del contenido de los códigos QR de los tickets (la dirección desde la que se escanean)
+QR_BASE_URL = 'http://127.0.0.1:8000'
+
 # Configuración de autenticación
 
 AUTH_USER_MODEL = 'accounts.User'
@@ -7,4 +7,5 @@ class CoreConfig(AppConfig):
     verbose_name = 'Administración del club'
 
     def ready(self):
-        pass
+        from core.parameters import conectar_parametros
+        conectar_parametros()
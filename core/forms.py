@@ -3,6 +3,7 @@ from django import forms
 from django.db import OperationalError, ProgrammingError
 
 from core.models import Club, Persona
+from core.parameters import get_parameters
 from socios.models import Parameters
 from static.credentials import MercadoPagoCredentials
 
@@ -39,7 +40,7 @@ class PersonaAdminForm(forms.ModelForm):
     Formulario para registrar los datos de una Persona. Se utiliza en el formulario de registro de un nuevo usuario.
     """
     try:
-        edad_minima_titular = Parameters.objects.get(club_id=1).edad_minima_titular
+        edad_minima_titular = get_parameters(Parameters).edad_minima_titular
         es_menor = forms.BooleanField(
             label='Es menor de {} años?'.format(edad_minima_titular),
             required=False,
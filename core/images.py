@@ -0,0 +1,60 @@
+#  Este archivo contiene el registro de las imágenes de los modelos (Club, Persona, Cancha y Evento)
+
+import hashlib
+
+from PIL import Image
+from django.conf import settings
+from django.core.cache import cache
+
+IMAGEN_VACIA = settings.STATIC_URL + 'img/empty.svg'
+
+# Segundos que se recuerda que una imagen no existe: una falla pasajera del almacenamiento no debe dejar la imagen
+# vacía hasta que se vuelva a guardar el modelo.
+TIMEOUT_IMAGEN_FALTANTE = 60
+
+
+def _clave(nombre):
+    """Devuelve la clave de la caché para la imagen con el nombre indicado."""
+    return 'imagen:{}'.format(hashlib.sha1(nombre.encode()).hexdigest())
+
+
+def registrar_imagen(imagen, tamano_maximo=None):
+    """
+    Redimensiona la imagen si supera el tamaño máximo y guarda en la caché su url, dimensiones y hash del contenido.
+    Se llama desde el save() de los modelos, que es el único momento en que se abre el archivo.
+    """
+    if not imagen:
+        return None
+    try:
+        with Image.open(imagen.path) as img:
+            if tamano_maximo and (img.height > tamano_maximo or img.width > tamano_maximo):
+                img.thumbnail((tamano_maximo, tamano_maximo))
+                img.save(imagen.path)
+            ancho, alto = img.size
+        with open(imagen.path, 'rb') as archivo:
+            contenido_hash = hashlib.sha256(archivo.read()).hexdigest()
+    except (FileNotFoundError, ValueError):
+        cache.delete(_clave(imagen.name))
+        return None
+    metadata = {'url': imagen.url, 'ancho': ancho, 'alto': alto, 'hash': contenido_hash}
+    cache.set(_clave(imagen.name), metadata, timeout=None)
+    return metadata
+
+
+def get_imagen_url(imagen):
+    """
+    Devuelve la url de la imagen, o la imagen vacía si no existe. Se responde desde la caché; si la imagen no está
+    registrada solo se verifica que el archivo exista, sin decodificarlo. Que el archivo no existe se recuerda por poco
+    tiempo.
+    """
+    if not imagen:
+        return IMAGEN_VACIA
+    metadata = cache.get(_clave(imagen.name))
+    if metadata is None:
+        if imagen.storage.exists(imagen.name):
+            metadata = {'url': imagen.url}
+            cache.set(_clave(imagen.name), metadata, timeout=None)
+        else:
+            metadata = {'url': IMAGEN_VACIA}
+            cache.set(_clave(imagen.name), metadata, timeout=TIMEOUT_IMAGEN_FALTANTE)
+    return metadata['url']
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from eventos.inventory import liberar_expiradas
+from eventos.models import VentaTicket
+from reservas.models import Reserva
+
+
+class Command(BaseCommand):
+    help = 'Da de baja las reservas y ventas de tickets que expiraron por falta de pago y libera las retenciones ' \
+           'de tickets expiradas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=int, default=0,
+                            help='Segundos entre cada ejecución. Si es 0 se ejecuta una sola vez.')
+
+    def handle(self, *args, **options):
+        intervalo = options['intervalo']
+        while True:
+            reservas = Reserva.objects.expiradas().expirar()
+            ventas = VentaTicket.objects.expiradas().expirar()
+            retenciones = liberar_expiradas()
+            if reservas or ventas or retenciones:
+                self.stdout.write('Reservas expiradas: {}. Ventas de tickets expiradas: {}. Retenciones de tickets '
+                                  'liberadas: {}.'.format(reservas, ventas, retenciones))
+            if not intervalo:
+                break
+            time.sleep(intervalo)
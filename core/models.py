@@ -1,8 +1,6 @@
 from datetime import datetime
 
-from PIL import Image
 from dateutil.relativedelta import relativedelta
-from django.conf import settings
 from django.db import models
 from django.db.models.functions import Now
 from django.forms import model_to_dict
@@ -10,6 +8,7 @@ from django_softdelete.models import SoftDeleteModel
 from simple_history.models import HistoricalRecords
 
 from accounts.models import User
+from core.images import registrar_imagen, get_imagen_url
 from socios.models import Socio
 
 
@@ -33,25 +32,13 @@ class Club(SoftDeleteModel):
         return self.nombre
 
     def save(self, *args, **kwargs):
-        """Método save() sobrescrito para redimensionar la imagen."""
+        """Método save() sobrescrito para redimensionar la imagen y registrar sus datos."""
         super().save(*args, **kwargs)
-        try:
-            img = Image.open(self.imagen.path)
-            if img.height > 300 or img.width > 300:
-                output_size = (300, 300)
-                img.thumbnail(output_size)
-                img.save(self.imagen.path)
-        except FileNotFoundError:
-            pass
+        registrar_imagen(self.imagen, 300)
 
     def get_imagen(self):
         """Método para obtener la imagen de perfil del usuario."""
-        try:
-            # Si existe una imagen en self.imagen.url, la devuelve.
-            Image.open(self.imagen.path)
-            return self.imagen.url
-        except FileNotFoundError:
-            return settings.STATIC_URL + 'img/empty.svg'
+        return get_imagen_url(self.imagen)
 
     class Meta:
         unique_together = ('localidad', 'direccion')
@@ -110,18 +97,13 @@ class Persona(SoftDeleteModel):
         """
         Devuelve la imagen de la persona.
         """
-        try:
-            # Si existe una imagen en self.imagen.url, la devuelve.
-            Image.open(self.imagen.path)
-            return self.imagen.url
-        except (FileNotFoundError, ValueError):
-            return settings.STATIC_URL + 'img/empty.svg'
+        return get_imagen_url(self.imagen)
 
     def es_titular(self):
         """
         Devuelve true si el campo persona_titular es nulo.
         """
-        return True if self.persona_titular is None else False
+        return True if self.persona_titular_id is None else False
 
     def get_socio(self, global_objects=False):
         """
@@ -138,6 +120,9 @@ class Persona(SoftDeleteModel):
         """
         Devuelve el grupo familiar de la persona.
         """
+        # Grupo familiar cargado en memoria por socios.families.cargar_grupos_familiares()
+        if hasattr(self, '_grupo_familiar'):
+            return self._grupo_familiar.miembros
         if self.es_titular():
             return self.persona_set.all()
         else:
@@ -166,16 +151,9 @@ class Persona(SoftDeleteModel):
         return item
 
     def save(self, *args, **kwargs):
-        """Método save() sobrescrito para redimensionar la imagen."""
+        """Método save() sobrescrito para redimensionar la imagen y registrar sus datos."""
         super().save(*args, **kwargs)
-        try:
-            img = Image.open(self.imagen.path)
-            if img.height > 300 or img.width > 300:
-                output_size = (300, 300)
-                img.thumbnail(output_size)
-                img.save(self.imagen.path)
-        except FileNotFoundError:
-            pass
+        registrar_imagen(self.imagen, 300)
 
     def clean(self):
         super(Persona, self).clean()
@@ -0,0 +1,50 @@
+#  Este archivo contiene la caché de los parámetros de cada club (reservas, eventos y socios)
+
+import uuid
+
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+
+# Parámetros cargados en este proceso: {(modelo, club_id): (version, parametros)}
+_parametros = {}
+
+
+def _clave_version(modelo, club_id):
+    """Devuelve la clave de la caché compartida donde se guarda la versión de los parámetros."""
+    return 'parameters:{}:{}'.format(modelo._meta.label_lower, club_id)
+
+
+def get_parameters(modelo, club_id=1):
+    """
+    Devuelve los parámetros del club para el modelo indicado.
+    Solo se consulta la base de datos cuando la versión guardada en la caché compartida cambió, de modo que todos los
+    procesos ven los cambios realizados por cualquiera de ellos.
+    """
+    clave = _clave_version(modelo, club_id)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, uuid.uuid4().hex, timeout=None)
+        version = cache.get(clave)
+    cargado = _parametros.get((modelo, club_id))
+    if cargado is not None and cargado[0] == version:
+        return cargado[1]
+    parametros = modelo.objects.get(club_id=club_id)
+    _parametros[(modelo, club_id)] = (version, parametros)
+    return parametros
+
+
+def invalidar_parametros(sender, instance, **kwargs):
+    """Cambia la versión de los parámetros del club para que todos los procesos vuelvan a leerlos."""
+    _parametros.pop((sender, instance.club_id), None)
+    cache.set(_clave_version(sender, instance.club_id), uuid.uuid4().hex, timeout=None)
+
+
+def conectar_parametros():
+    """Conecta la invalidación de la caché a los modelos de parámetros de cada app."""
+    from eventos.models import Parameters as EventoParameters
+    from reservas.models import Parameters as ReservaParameters
+    from socios.models import Parameters as SocioParameters
+    for modelo in (EventoParameters, ReservaParameters, SocioParameters):
+        post_save.connect(invalidar_parametros, sender=modelo, dispatch_uid='invalidar_{}'.format(modelo._meta.label))
+        post_delete.connect(invalidar_parametros, sender=modelo,
+                            dispatch_uid='invalidar_borrado_{}'.format(modelo._meta.label))
@@ -3,6 +3,7 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from core.models import Persona
+from core.parameters import get_parameters
 from socios.models import Parameters
 
 
@@ -11,7 +12,7 @@ def post_save_persona(sender, instance, created, **kwargs):
     """
     Este método debe ejecutarse después de guardar el formulario.
     """
-    edad_minima_titular = Parameters.objects.get(club=instance.club).edad_minima_titular
+    edad_minima_titular = get_parameters(Parameters, instance.club_id).edad_minima_titular
     if instance.es_titular():
         if instance.get_edad() < edad_minima_titular:
             raise forms.ValidationError(
@@ -0,0 +1,25 @@
+#  Este archivo contiene la ejecución de tareas en segundo plano (fuera de la petición y de la transacción)
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import transaction, connections
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='tareas')
+
+
+def _ejecutar(funcion, *args, **kwargs):
+    """Ejecuta la tarea y cierra las conexiones a la base de datos que haya abierto el hilo."""
+    try:
+        funcion(*args, **kwargs)
+    except Exception as e:
+        print('Ha ocurrido un error en la tarea {}: '.format(funcion.__name__), e)
+    finally:
+        connections.close_all()
+
+
+def ejecutar_en_segundo_plano(funcion, *args, **kwargs):
+    """
+    Ejecuta la función en un hilo aparte una vez confirmada la transacción actual, para no demorar la respuesta ni
+    mantener bloqueada la base de datos.
+    """
+    transaction.on_commit(lambda: _executor.submit(_ejecutar, funcion, *args, **kwargs))
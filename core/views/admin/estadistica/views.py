@@ -1,9 +1,10 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Count
 from django.http import JsonResponse
 from django.views.generic import TemplateView
 
 from config.mixins import AdminRequiredMixin
-from eventos.models import Evento, VentaTicket
+from eventos.models import Evento, VentaTicket, Ticket
 from reservas.models import Reserva, HoraLaboral
 
 
@@ -34,17 +35,32 @@ class EstadisticaAdminView(LoginRequiredMixin, AdminRequiredMixin, TemplateView)
                     'total': total,
                 })
         elif report == 'evento':
-            # Obtener la recaudación de los eventos en el rango de fechas seleccionado
-            data = []
-            eventos = Evento.objects.filter(fecha_inicio__range=[start_date, end_date])
-            for evento in eventos:
-                total = 0
-                for venta in VentaTicket.objects.filter(evento=evento, pagado=True):
-                    total += venta.total()
-                data.append({
-                    'evento': evento.nombre,
-                    'total': total,
+            # Obtener la recaudación de los eventos en el rango de fechas seleccionado, con la cantidad de tickets
+            # vendidos y usados por variante. Se resuelve con dos consultas agrupadas, sin importar la cantidad de
+            # eventos o ventas.
+            eventos = Evento.objects.filter(fecha_inicio__range=[start_date, end_date]).order_by('fecha_inicio', 'pk')
+            recaudacion = VentaTicket.objects.filter(evento__in=eventos, pagado=True).recaudacion_por_evento()
+            data = {evento_id: {
+                'evento': nombre,
+                'total': float(recaudacion.get(evento_id, 0)),
+                'tickets': 0,
+                'ingresos': 0,
+                'variantes': [],
+            } for evento_id, nombre in eventos.values_list('pk', 'nombre')}
+            for fila in Ticket.objects.filter(ticket_variante__evento__in=eventos, venta_ticket__pagado=True).values(
+                    'ticket_variante__evento', 'ticket_variante__nombre').annotate(
+                    tickets=Count('pk'), ingresos=Count('check_date')).order_by('ticket_variante'):
+                item = data[fila['ticket_variante__evento']]
+                item['tickets'] += fila['tickets']
+                item['ingresos'] += fila['ingresos']
+                item['variantes'].append({
+                    'nombre': fila['ticket_variante__nombre'],
+                    'tickets': fila['tickets'],
+                    'ingresos': fila['ingresos'],
                 })
+            data = list(data.values())
+            for item in data:
+                item['tasa_ingreso'] = round(item['ingresos'] * 100 / item['tickets'], 2) if item['tickets'] else 0
         return JsonResponse(data, safe=False)
 
 # TODO: Mejorar los gráficos estadísticos
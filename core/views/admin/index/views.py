@@ -19,5 +19,5 @@ class IndexAdminView(LoginRequiredMixin, AdminRequiredMixin, TemplateView):
         context['socios_activos'] = Socio.objects.all().count()
         context['reservas_activas'] = Reserva.objects.all().count()
         context['tickets_vendidos'] = Ticket.objects.all().count()
-        context['cuotas_sociales_pendientes'] = CuotaSocial.objects.filter(pagocuotasocial__isnull=True).count()
+        context['cuotas_sociales_pendientes'] = CuotaSocial.objects.filter(pagada=False).count()
         return context
@@ -1,23 +1,53 @@
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.db import transaction
 from django.http import JsonResponse
+from django.urls import reverse
 from django.views.generic import ListView, CreateView, UpdateView
 
+from config.mixins import DataTableMixin
 from core.forms import PersonaAdminForm
 from core.models import Persona
 
 
-class PersonaAdminListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class PersonaAdminListView(LoginRequiredMixin, PermissionRequiredMixin, DataTableMixin, ListView):
     """ Vista para el listado de personas """
     model = Persona
     template_name = 'admin/persona/list.html'
     permission_required = 'accounts.view_persona'
     context_object_name = 'personas'
+    datatable_values = ['id', 'cuil', 'nombre', 'apellido', 'fecha_nacimiento', 'persona_titular_id', 'socio__id',
+                        'socio__is_deleted']
+    datatable_search_fields = ['id', 'cuil', 'nombre', 'apellido']
+    datatable_order_fields = {
+        'id': 'id',
+        'cuil': 'cuil',
+        'nombre_completo': ['nombre', 'apellido'],
+        'edad': '-fecha_nacimiento',
+        'es_titular': 'persona_titular_id',
+        'es_socio': 'socio__id',
+    }
+    datatable_default_order = ['-id']
 
     def get_queryset(self):
         return Persona.global_objects.all()
 
+    def get_datatable_row(self, row):
+        cuil = row.pop('cuil')
+        socio_id = row.pop('socio__id')
+        socio_activo = row.pop('socio__is_deleted') is False
+        row['cuil'] = cuil[:2] + '-' + cuil[2:10] + '-' + cuil[10:]
+        row['nombre_completo'] = row.pop('nombre') + ' ' + row.pop('apellido')
+        row['edad'] = relativedelta(datetime.now(), row.pop('fecha_nacimiento')).years
+        row['es_titular'] = row.pop('persona_titular_id') is None
+        row['es_socio'] = socio_id is not None and socio_activo
+        row['url_editar'] = reverse('admin-persona-editar', args=[row['id']])
+        row['url_socio'] = reverse('admin-socio-detalle', args=[socio_id]) if row['es_socio'] else None
+        return row
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Listado de Personas'
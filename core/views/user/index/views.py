@@ -1,10 +1,9 @@
-from datetime import datetime
-
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.views.generic import TemplateView
 
 from core.models import Club
+from eventos.cache import get_version_tarjetas, TIMEOUT_TARJETAS
 from eventos.models import Evento
 from reservas.forms import ReservaIndexForm
 
@@ -18,10 +17,12 @@ class IndexView(TemplateView):
         context['title'] = 'Inicio'
         context['club_logo'] = Club.objects.get(pk=1).get_imagen()
         context['reserva_form'] = ReservaIndexForm()
-        eventos = []
-        for e in Evento.objects.filter(fecha_inicio__gte=datetime.now().date()).order_by('fecha_inicio'):
-            eventos.append(e) if e.get_start_datetime() > datetime.now() else None
-        context['eventos'] = eventos[:5]
+        # Las tarjetas se guardan en la caché según la versión y los eventos listados: si están en la caché solo se
+        # consultan los ids de los próximos eventos.
+        context['eventos'] = Evento.objects.proximos()[:5]
+        context['eventos_ids'] = list(context['eventos'].values_list('pk', flat=True))
+        context['eventos_version'] = get_version_tarjetas()
+        context['eventos_timeout'] = TIMEOUT_TARJETAS
         return context
 
     def post(self, request, *args, **kwargs):
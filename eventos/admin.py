@@ -31,3 +31,4 @@ admin.site.register(Ticket, TicketAdmin)
 admin.site.register(VentaTicket, VentaTicketAdmin)
 admin.site.register(ItemVentaTicket, SimpleHistoryAdmin)
 admin.site.register(PagoVentaTicket, SimpleHistoryAdmin)
+admin.site.register(AvisoEvento)
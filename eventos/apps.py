@@ -5,3 +5,8 @@ class EventosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'eventos'
     verbose_name = 'Eventos'
+
+    def ready(self):
+        from eventos.cache import conectar_tarjetas
+        conectar_tarjetas()
+        import eventos.signals
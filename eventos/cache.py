@@ -0,0 +1,35 @@
+#  Este archivo contiene la caché de las tarjetas de los eventos (página de inicio y listado de eventos)
+
+import uuid
+
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+
+CLAVE_VERSION = 'eventos:tarjetas:version'
+TIMEOUT_TARJETAS = 60 * 60 * 24
+
+
+def get_version_tarjetas():
+    """
+    Devuelve la versión de las tarjetas de los eventos guardada en la caché compartida. Forma parte de la clave del
+    fragmento de plantilla, de modo que al cambiarla todos los procesos vuelven a renderizar las tarjetas.
+    """
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def invalidar_tarjetas(sender, **kwargs):
+    """Cambia la versión de las tarjetas de los eventos, por ejemplo al modificar un evento o sus variantes."""
+    cache.set(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+
+
+def conectar_tarjetas():
+    """Conecta la invalidación de las tarjetas a los eventos y a sus variantes de ticket."""
+    from eventos.models import Evento, TicketVariante
+    for modelo in (Evento, TicketVariante):
+        post_save.connect(invalidar_tarjetas, sender=modelo, dispatch_uid='tarjetas_{}'.format(modelo._meta.label))
+        post_delete.connect(invalidar_tarjetas, sender=modelo,
+                            dispatch_uid='tarjetas_borrado_{}'.format(modelo._meta.label))
@@ -0,0 +1,167 @@
+#  Este archivo contiene el registro de ingreso (check-in) de los tickets en la puerta del evento
+
+import hashlib
+from urllib.parse import urlparse
+
+from django.db import transaction
+from django.db.models import Case, When, Value, DateTimeField
+from django.urls import resolve, Resolver404
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_datetime
+
+from eventos.models import Ticket, VentaTicket
+from eventos.qr import get_firma, leer_token
+
+ADMITIDO = 'admitido'
+USADO = 'usado'
+NO_PAGADO = 'no_pagado'
+INEXISTENTE = 'inexistente'
+HASH_INVALIDO = 'hash_invalido'
+REPETIDO = 'repetido'
+EVENTO_INCORRECTO = 'evento_incorrecto'
+REVOCADO = 'revocado'
+
+MENSAJES = {
+    ADMITIDO: 'Ingreso registrado',
+    USADO: 'El ticket ya ha sido usado',
+    NO_PAGADO: 'El ticket no ha sido pagado',
+    INEXISTENTE: 'El ticket no existe o el código QR no es válido',
+    HASH_INVALIDO: 'El ticket no coincide con el manifiesto',
+    REPETIDO: 'El ticket se escaneó más de una vez en el lote',
+    EVENTO_INCORRECTO: 'El ticket es de otro evento',
+    REVOCADO: 'El código QR fue reemplazado por uno nuevo',
+}
+
+
+def leer_codigo(codigo):
+    """
+    Devuelve (ticket_id, evento_id, version) a partir del contenido del código QR (la url de check-in o el token), o
+    None si el token no es válido. Solo verifica la firma: no consulta la base de datos.
+    """
+    codigo = (codigo or '').strip()
+    if '/' in codigo:
+        try:
+            match = resolve(urlparse(codigo).path)
+        except Resolver404:
+            return None
+        if match.url_name != 'admin-tickets-qr':
+            return None
+        codigo = match.kwargs['token']
+    return leer_token(codigo)
+
+
+def registrar_ingreso(ticket_id, version, usuario):
+    """
+    Marca el ticket como usado con un único UPDATE condicional (no usado, con la versión vigente del código QR, no dado
+    de baja y con la venta pagada), de modo que dos puertas no puedan admitir el mismo ticket. Devuelve (resultado,
+    datos del ticket).
+
+    El cambio no pasa por save(), por lo que no se registra en el historial: la fecha y el operador quedan en el ticket.
+    """
+    admitidos = Ticket.objects.filter(
+        pk=ticket_id, is_used=False, qr_version=version,
+        venta_ticket_id__in=VentaTicket.objects.filter(pagado=True, is_deleted=False).values('pk'),
+    ).update(is_used=True, check_date=timezone.now(), check_by=usuario, date_updated=timezone.now())
+    datos = Ticket.objects.filter(pk=ticket_id).values(
+        'id', 'nombre', 'dni', 'is_used', 'check_date', 'check_by__email', 'venta_ticket__pagado', 'qr_version',
+        'ticket_variante__nombre', 'ticket_variante__evento__nombre').first()
+    if admitidos:
+        return ADMITIDO, datos
+    if datos is None:
+        return INEXISTENTE, None
+    if datos['qr_version'] != version:
+        return REVOCADO, datos
+    if not datos['venta_ticket__pagado']:
+        return NO_PAGADO, datos
+    return USADO, datos
+
+
+def get_huella(firma):
+    """
+    Devuelve la huella (SHA-256 truncado a 16 caracteres) de la firma de un código QR. El manifiesto lleva la huella y
+    no la firma, de modo que con un dispositivo perdido no se puedan armar tokens válidos.
+    """
+    return hashlib.sha256(firma.encode()).hexdigest()[:16]
+
+
+def generar_manifiesto(evento):
+    """
+    Devuelve el manifiesto de check-in del evento: los tickets vigentes de ventas pagadas con la huella de la firma de
+    su código QR, nombre, DNI y variante, y los ids de los que ya se usaron. Se arma con una sola consulta.
+    """
+    tickets = []
+    usados = []
+    variantes = {}
+    for ticket_id, version, nombre, dni, variante_id, variante, is_used in Ticket.objects.filter(
+            ticket_variante__evento=evento, venta_ticket__pagado=True, venta_ticket__is_deleted=False).values_list(
+            'id', 'qr_version', 'nombre', 'dni', 'ticket_variante_id', 'ticket_variante__nombre',
+            'is_used').order_by('id'):
+        tickets.append([ticket_id, get_huella(get_firma(ticket_id, evento.pk, version)), nombre, dni, variante_id])
+        variantes[variante_id] = variante
+        if is_used:
+            usados.append(ticket_id)
+    return {
+        'evento': evento.pk,
+        'nombre': evento.nombre,
+        'generado': timezone.now().isoformat(),
+        'variantes': variantes,
+        'tickets': tickets,
+        'usados': usados,
+    }
+
+
+def sincronizar_ingresos(evento, ingresos, usuario):
+    """
+    Aplica en lote los ingresos registrados sin conexión, con la forma [{'id', 'hash', 'fecha'}]. El hash es la firma
+    del código QR escaneado, que se verifica contra la firma real; el manifiesto solo lleva su huella (get_huella()).
+    Los tickets libres se marcan como usados con un único UPDATE condicional que conserva la fecha de cada escaneo.
+    Devuelve la cantidad aplicada y los conflictos (ticket inexistente, hash inválido, no pagado, ya usado o repetido
+    en el lote).
+    """
+    conflictos = []
+    fechas = {}
+    ids = [ingreso.get('id') for ingreso in ingresos]
+    tickets = {fila['id']: fila for fila in Ticket.objects.filter(pk__in=ids, ticket_variante__evento=evento).values(
+        'id', 'qr_version', 'is_used', 'check_date', 'check_by__email', 'venta_ticket__pagado')}
+    for ingreso in ingresos:
+        ticket = tickets.get(ingreso.get('id'))
+        fecha = parse_datetime(str(ingreso.get('fecha') or '')) or timezone.now()
+        if ticket is None:
+            motivo = INEXISTENTE
+        elif not constant_time_compare(str(ingreso.get('hash')),
+                                       get_firma(ticket['id'], evento.pk, ticket['qr_version'])):
+            motivo = HASH_INVALIDO
+        elif not ticket['venta_ticket__pagado']:
+            motivo = NO_PAGADO
+        elif ticket['is_used']:
+            motivo = USADO
+        elif ticket['id'] in fechas:
+            motivo = REPETIDO
+        else:
+            fechas[ticket['id']] = fecha
+            continue
+        conflicto = {'id': ingreso.get('id'), 'motivo': motivo, 'fecha': fecha.isoformat()}
+        if motivo == USADO:
+            conflicto['check_date'] = ticket['check_date'].isoformat()
+            conflicto['check_by'] = ticket['check_by__email']
+        conflictos.append(conflicto)
+    aplicados = 0
+    if fechas:
+        with transaction.atomic():
+            aplicados = Ticket.objects.filter(
+                pk__in=fechas, is_used=False,
+                venta_ticket_id__in=VentaTicket.objects.filter(pagado=True, is_deleted=False).values('pk'),
+            ).update(is_used=True, check_by=usuario, date_updated=timezone.now(),
+                     check_date=Case(*[When(pk=ticket_id, then=Value(fecha)) for ticket_id, fecha in fechas.items()],
+                                     output_field=DateTimeField()))
+            if aplicados < len(fechas):
+                # Otro dispositivo registró alguno de los tickets entre la lectura y la actualización.
+                for fila in Ticket.objects.filter(pk__in=fechas).values('id', 'check_date', 'check_by_id',
+                                                                       'check_by__email'):
+                    if fila['check_by_id'] != usuario.pk or fila['check_date'] != fechas[fila['id']]:
+                        conflictos.append({'id': fila['id'], 'motivo': USADO,
+                                           'fecha': fechas[fila['id']].isoformat(),
+                                           'check_date': fila['check_date'].isoformat(),
+                                           'check_by': fila['check_by__email']})
+    return aplicados, conflictos
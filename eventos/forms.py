@@ -38,7 +38,7 @@ class TicketVarianteForm(forms.ModelForm):
 
     class Meta:
         model = TicketVariante
-        exclude = ['is_deleted', 'deleted_at']
+        exclude = ['is_deleted', 'deleted_at', 'tickets_disponibles']
         widgets = {
             'evento': forms.Select(attrs={'disabled': True}),
             'nombre': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ingrese el nombre del ticket'}),
@@ -0,0 +1,104 @@
+#  Este archivo contiene el control de stock de tickets para la app eventos
+
+from collections import Counter
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Count, Sum, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from core.parameters import get_parameters
+from eventos.models import TicketVariante, RetencionTicket, Parameters, Ticket
+
+
+def descontar(ticket_variante_id, cantidad):
+    """
+    Descuenta la cantidad del stock de la variante con un UPDATE condicional. Devuelve False si no hay stock
+    suficiente, sin contar los tickets vendidos.
+    """
+    return TicketVariante.objects.filter(pk=ticket_variante_id, tickets_disponibles__gte=cantidad).update(
+        tickets_disponibles=F('tickets_disponibles') - cantidad) == 1
+
+
+def devolver(cantidades):
+    """Devuelve al stock las cantidades indicadas, con la forma {ticket_variante_id: cantidad}."""
+    for ticket_variante_id, cantidad in cantidades.items():
+        if cantidad:
+            TicketVariante.objects.filter(pk=ticket_variante_id).update(
+                tickets_disponibles=F('tickets_disponibles') + cantidad)
+
+
+def retener(cantidades, club_id=1):
+    """
+    Retiene los tickets elegidos por el cliente hasta que complete la compra o pasen los minutos de expiración de la
+    venta. Si alguna variante no tiene stock suficiente no se retiene ninguna. Devuelve los ids de las retenciones.
+    """
+    minutos = get_parameters(Parameters, club_id).minutos_expiracion_venta
+    fecha_expiracion = timezone.now() + timedelta(minutes=minutos)
+    with transaction.atomic():
+        for ticket_variante_id, cantidad in cantidades.items():
+            if not descontar(ticket_variante_id, cantidad):
+                nombre = TicketVariante.objects.values_list('nombre', flat=True).get(pk=ticket_variante_id)
+                raise ValidationError('No hay suficientes tickets {} disponibles'.format(nombre))
+        retenciones = RetencionTicket.objects.bulk_create([
+            RetencionTicket(ticket_variante_id=ticket_variante_id, cantidad=cantidad,
+                            fecha_expiracion=fecha_expiracion)
+            for ticket_variante_id, cantidad in cantidades.items()])
+    return [retencion.pk for retencion in retenciones]
+
+
+def liberar(retenciones):
+    """Borra las retenciones del queryset y devuelve sus tickets al stock. Devuelve la cantidad de retenciones."""
+    with transaction.atomic():
+        filas = list(retenciones.select_for_update().values_list('pk', 'ticket_variante_id', 'cantidad'))
+        RetencionTicket.objects.filter(pk__in=[pk for pk, ticket_variante_id, cantidad in filas]).delete()
+        cantidades = Counter()
+        for pk, ticket_variante_id, cantidad in filas:
+            cantidades[ticket_variante_id] += cantidad
+        devolver(cantidades)
+    return len(filas)
+
+
+def liberar_expiradas():
+    """Libera en lote las retenciones expiradas."""
+    return liberar(RetencionTicket.objects.expiradas())
+
+
+def confirmar(retencion_ids, cantidades):
+    """
+    Convierte las retenciones en tickets vendidos: las borra sin devolver el stock. Si alguna ya fue liberada por
+    expirar, vuelve a descontar lo que falte. Debe llamarse dentro de la transacción que crea la venta.
+    """
+    retenidas = Counter()
+    filas = list(RetencionTicket.objects.filter(pk__in=retencion_ids).select_for_update().values_list(
+        'pk', 'ticket_variante_id', 'cantidad'))
+    RetencionTicket.objects.filter(pk__in=[pk for pk, ticket_variante_id, cantidad in filas]).delete()
+    for pk, ticket_variante_id, cantidad in filas:
+        retenidas[ticket_variante_id] += cantidad
+    for ticket_variante_id, cantidad in cantidades.items():
+        faltantes = cantidad - retenidas.pop(ticket_variante_id, 0)
+        if faltantes > 0 and not descontar(ticket_variante_id, faltantes):
+            nombre = TicketVariante.objects.values_list('nombre', flat=True).get(pk=ticket_variante_id)
+            raise ValidationError('No hay suficientes tickets {} disponibles'.format(nombre))
+        elif faltantes < 0:
+            devolver({ticket_variante_id: -faltantes})
+    # Retenciones de variantes que ya no forman parte de la compra.
+    devolver(retenidas)
+
+
+def recalcular(variantes=None):
+    """
+    Recalcula en un único UPDATE el stock de las variantes indicadas (o de todas): total de tickets menos los tickets
+    vigentes y los retenidos. Las ventas y retenciones expiradas que todavía no se liberaron se cuentan, porque al
+    liberarlas se devuelven al stock. Devuelve la cantidad de variantes actualizadas.
+    """
+    if variantes is None:
+        variantes = TicketVariante.objects.all()
+    vendidos = Ticket.objects.filter(ticket_variante=OuterRef('pk')).order_by().values('ticket_variante').annotate(
+        cantidad=Count('pk')).values('cantidad')
+    retenidos = RetencionTicket.objects.filter(ticket_variante=OuterRef('pk')).order_by().values(
+        'ticket_variante').annotate(cantidad=Sum('cantidad')).values('cantidad')
+    return variantes.update(tickets_disponibles=Greatest(
+        F('total_tickets') - Coalesce(Subquery(vendidos), 0) - Coalesce(Subquery(retenidos), 0), Value(0)))
@@ -0,0 +1,96 @@
+import contextlib
+import io
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from accounts.models import User
+from eventos.checkin import ADMITIDO, USADO, INEXISTENTE
+from eventos.models import TicketVariante, VentaTicket, Ticket
+
+EMAIL = 'check-in@benchmark.local'
+
+
+class Command(BaseCommand):
+    help = 'Escanea tickets en paralelo, como varias puertas a la vez, a través del endpoint de check-in y mide ' \
+           'escaneos por segundo, latencias y que ningún ticket se admita dos veces. Usa la base de datos ' \
+           'configurada y elimina los tickets creados al terminar.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=500, help='Cantidad de tickets pagados a escanear.')
+        parser.add_argument('--lecturas', type=int, default=2,
+                            help='Veces que se escanea cada ticket (lecturas repetidas en distintas puertas).')
+        parser.add_argument('--falsos', type=int, default=0,
+                            help='Cantidad de escaneos con la firma del código QR alterada, que deben rechazarse.')
+        parser.add_argument('--puertas', type=int, default=8, help='Cantidad de escaneos simultáneos.')
+        parser.add_argument('--conservar', action='store_true', help='No eliminar los tickets creados.')
+
+    def crear_tickets(self, cantidad):
+        """Crea una venta pagada con la cantidad de tickets indicada. Devuelve la venta y los tickets."""
+        ticket_variante = TicketVariante.objects.select_related('evento').first()
+        if ticket_variante is None:
+            raise CommandError('No hay variantes de tickets cargadas.')
+        venta = VentaTicket.objects.create(evento=ticket_variante.evento, email=EMAIL, subtotal=0, pagado=True)
+        tickets = Ticket.objects.bulk_create([
+            Ticket(venta_ticket=venta, ticket_variante=ticket_variante, dni=str(i), nombre='Benchmark {}'.format(i))
+            for i in range(cantidad)])
+        return venta, tickets
+
+    def escanear(self, usuario, url, codigo):
+        """Envía un escaneo y devuelve (resultado, segundos). Cada puerta (hilo) mantiene su propia sesión."""
+        if not hasattr(self.puerta, 'client'):
+            self.puerta.client = Client()
+            self.puerta.client.force_login(usuario)
+        inicio = time.perf_counter()
+        data = self.puerta.client.post(url, {'codigo': codigo}).json()
+        return data.get('resultado', data.get('error')), time.perf_counter() - inicio
+
+    def handle(self, *args, **options):
+        usuario = User.objects.filter(is_superuser=True, is_active=True).first()
+        if usuario is None:
+            raise CommandError('Se necesita un superusuario activo para escanear.')
+        venta, tickets = self.crear_tickets(options['tickets'])
+        ids = [ticket.pk for ticket in tickets]
+        codigos = [reverse('admin-tickets-qr', kwargs={'token': ticket.get_qr_token()}) for ticket in tickets]
+        # Un código falso lleva el token de un ticket real con la firma alterada.
+        falsos = [codigo[:-2] + '0/' if codigo[-2] != '0' else codigo[:-2] + '1/'
+                  for codigo in random.choices(codigos, k=options['falsos'])]
+        lecturas = codigos * options['lecturas'] + falsos
+        random.shuffle(lecturas)
+        url = reverse('admin-tickets-check-in')
+        self.puerta = threading.local()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                inicio = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['puertas']) as executor:
+                    resultados = list(executor.map(lambda codigo: self.escanear(usuario, url, codigo), lecturas))
+                total = time.perf_counter() - inicio
+            latencias = sorted(duracion for resultado, duracion in resultados)
+            admitidos = sum(1 for resultado, duracion in resultados if resultado == ADMITIDO)
+            usados = sum(1 for resultado, duracion in resultados if resultado == USADO)
+            rechazados = sum(1 for resultado, duracion in resultados if resultado == INEXISTENTE)
+            self.stdout.write('Escaneos: {} ({} tickets, {} puertas)'.format(
+                len(lecturas), len(ids), options['puertas']))
+            self.stdout.write('Rendimiento: {:.1f} escaneos/s en {:.2f} s'.format(len(lecturas) / total, total))
+            self.stdout.write('Latencia p50: {:.1f} ms, p99: {:.1f} ms, máx: {:.1f} ms'.format(
+                latencias[len(latencias) // 2] * 1000, latencias[int(len(latencias) * 0.99)] * 1000,
+                latencias[-1] * 1000))
+            self.stdout.write('Admitidos: {}. Rechazados por ya usados: {}. Rechazados por código inválido: {} de {} '
+                              'falsos. Otros: {}.'.format(admitidos, usados, rechazados, len(falsos),
+                                                         len(lecturas) - admitidos - usados - rechazados))
+            if admitidos == len(ids) and Ticket.objects.filter(pk__in=ids, is_used=False).count() == 0:
+                self.stdout.write(self.style.SUCCESS('Cada ticket se admitió una sola vez.'))
+            else:
+                self.stdout.write(self.style.ERROR('Se admitieron {} ingresos para {} tickets.'.format(
+                    admitidos, len(ids))))
+        finally:
+            if not options['conservar']:
+                Ticket.global_objects.filter(venta_ticket=venta).delete()
+                Ticket.history.filter(venta_ticket_id=venta.pk).delete()
+                VentaTicket.global_objects.filter(pk=venta.pk).delete()
+                VentaTicket.history.filter(id=venta.pk).delete()
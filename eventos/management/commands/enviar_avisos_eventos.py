@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from eventos.notifications import enviar_avisos
+
+
+class Command(BaseCommand):
+    help = 'Envía los avisos de cambios en eventos que quedaron pendientes o fallaron, hasta agotar los intentos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=int, default=0,
+                            help='Segundos entre cada ejecución. Si es 0 se ejecuta una sola vez.')
+
+    def handle(self, *args, **options):
+        intervalo = options['intervalo']
+        while True:
+            try:
+                enviados, fallidos = enviar_avisos()
+                if enviados or fallidos:
+                    self.stdout.write('Avisos enviados: {}. Fallidos: {}.'.format(enviados, fallidos))
+            except Exception as e:
+                # Con --intervalo el comando sigue ejecutándose: los avisos se reintentan en la próxima vuelta.
+                self.stderr.write('Error al enviar los avisos: {}'.format(e))
+            if not intervalo:
+                break
+            time.sleep(intervalo)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from eventos.inventory import recalcular
+from eventos.models import TicketVariante
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el stock de tickets disponibles de cada variante (total de tickets menos los vendidos y los ' \
+           'retenidos), por ejemplo luego de cargar variantes con loaddata.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            anteriores = dict(TicketVariante.objects.select_for_update().values_list('pk', 'tickets_disponibles'))
+            actualizadas = recalcular()
+            corregidas = sum(1 for pk, disponibles in TicketVariante.objects.values_list('pk', 'tickets_disponibles')
+                             if anteriores.get(pk) != disponibles)
+        self.stdout.write(self.style.SUCCESS('Variantes de tickets actualizadas: {}. Con el stock corregido: '
+                                             '{}.'.format(actualizadas, corregidas)))
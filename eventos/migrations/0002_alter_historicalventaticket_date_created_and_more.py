@@ -0,0 +1,23 @@
+# Generated by Django 4.1.3 on 2026-10-18 08:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historicalventaticket',
+            name='date_created',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, verbose_name='Fecha de creación'),
+        ),
+        migrations.AlterField(
+            model_name='ventaticket',
+            name='date_created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Fecha de creación'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:09
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def inicializar_tickets_disponibles(apps, schema_editor):
+    """Calcula el stock inicial de cada variante: total de tickets menos los vendidos en ventas vigentes."""
+    TicketVariante = apps.get_model('eventos', 'TicketVariante')
+    Parameters = apps.get_model('eventos', 'Parameters')
+    parameters = Parameters.objects.filter(club_id=1).first()
+    minutos = parameters.minutos_expiracion_venta if parameters else 5
+    vencimiento = timezone.now() - timedelta(minutes=minutos)
+    vendidos = Q(ticket__is_deleted=False) & ~Q(ticket__venta_ticket__pagado=False,
+                                                 ticket__venta_ticket__date_created__lt=vencimiento)
+    for variante in TicketVariante.objects.annotate(vendidos=Count('ticket', filter=vendidos)):
+        TicketVariante.objects.filter(pk=variante.pk).update(
+            tickets_disponibles=max(variante.total_tickets - variante.vendidos, 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0002_alter_historicalventaticket_date_created_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalticketvariante',
+            name='tickets_disponibles',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Tickets disponibles'),
+        ),
+        migrations.AddField(
+            model_name='ticketvariante',
+            name='tickets_disponibles',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Tickets disponibles'),
+        ),
+        migrations.CreateModel(
+            name='RetencionTicket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(verbose_name='Cantidad')),
+                ('fecha_expiracion', models.DateTimeField(db_index=True, verbose_name='Fecha de expiración')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('ticket_variante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='eventos.ticketvariante', verbose_name='Variante de ticket')),
+            ],
+            options={
+                'verbose_name': 'Retención de tickets',
+                'verbose_name_plural': 'Retenciones de tickets',
+            },
+        ),
+        migrations.RunPython(inicializar_tickets_disponibles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:10
+
+from django.db import migrations, models
+import eventos.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0003_historicalticketvariante_tickets_disponibles_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalticket',
+            name='qr_png',
+            field=models.TextField(blank=True, editable=False, max_length=100, null=True, verbose_name='Código QR (PNG)'),
+        ),
+        migrations.AddField(
+            model_name='historicalticket',
+            name='qr_svg',
+            field=models.TextField(blank=True, editable=False, max_length=100, null=True, verbose_name='Código QR (SVG)'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='qr_png',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to=eventos.models.Ticket.qr_directory_path, verbose_name='Código QR (PNG)'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='qr_svg',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to=eventos.models.Ticket.qr_directory_path, verbose_name='Código QR (SVG)'),
+        ),
+    ]
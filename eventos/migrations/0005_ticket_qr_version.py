@@ -0,0 +1,30 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:17
+
+from django.db import migrations, models
+
+
+def borrar_codigos_qr(apps, schema_editor):
+    """Los códigos QR guardados llevan la url con el id del ticket: se borran para generarlos con el token firmado."""
+    Ticket = apps.get_model('eventos', 'Ticket')
+    Ticket.objects.update(qr_svg=None, qr_png=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0004_historicalticket_qr_png_historicalticket_qr_svg_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalticket',
+            name='qr_version',
+            field=models.PositiveSmallIntegerField(default=1, editable=False, verbose_name='Versión del código QR'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='qr_version',
+            field=models.PositiveSmallIntegerField(default=1, editable=False, verbose_name='Versión del código QR'),
+        ),
+        migrations.RunPython(borrar_codigos_qr, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0005_ticket_qr_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvisoEvento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, verbose_name='Correo electrónico')),
+                ('enviado', models.BooleanField(default=False, verbose_name='Enviado')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('error', models.TextField(blank=True, verbose_name='Último error')),
+                ('reservado_hasta', models.DateTimeField(blank=True, help_text='Hasta esta fecha el aviso no se vuelve a intentar: lo está enviando una tarea o espera para reintentarse.', null=True, verbose_name='Reservado hasta')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('date_sent', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de envío')),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='eventos.evento', verbose_name='Evento')),
+            ],
+            options={
+                'verbose_name': 'Aviso de evento',
+                'verbose_name_plural': 'Avisos de eventos',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='avisoevento',
+            constraint=models.UniqueConstraint(condition=models.Q(('enviado', False)), fields=('evento', 'email'), name='aviso_evento_pendiente_unico'),
+        ),
+    ]
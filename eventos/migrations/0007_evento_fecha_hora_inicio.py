@@ -0,0 +1,36 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:22
+
+from datetime import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def calcular_fecha_hora_inicio(apps, schema_editor):
+    """Guarda la fecha y hora de inicio de los eventos existentes."""
+    Evento = apps.get_model('eventos', 'Evento')
+    eventos = list(Evento.objects.all())
+    for evento in eventos:
+        evento.fecha_hora_inicio = timezone.make_aware(datetime.combine(evento.fecha_inicio, evento.hora_inicio))
+    Evento.objects.bulk_update(eventos, ['fecha_hora_inicio'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0006_avisoevento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='fecha_hora_inicio',
+            field=models.DateTimeField(db_index=True, editable=False, help_text='Se calcula al guardar a partir de la fecha y hora de inicio.', null=True, verbose_name='Fecha y hora de inicio'),
+        ),
+        migrations.AddField(
+            model_name='historicalevento',
+            name='fecha_hora_inicio',
+            field=models.DateTimeField(db_index=True, editable=False, help_text='Se calcula al guardar a partir de la fecha y hora de inicio.', null=True, verbose_name='Fecha y hora de inicio'),
+        ),
+        migrations.RunPython(calcular_fecha_hora_inicio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:44
+
+from datetime import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def completar_fecha_hora_inicio(apps, schema_editor):
+    """Guarda la fecha y hora de inicio de los eventos (y sus registros históricos) que quedaron sin calcular."""
+    for modelo in ('Evento', 'HistoricalEvento'):
+        Modelo = apps.get_model('eventos', modelo)
+        eventos = list(Modelo.objects.filter(fecha_hora_inicio__isnull=True))
+        for evento in eventos:
+            evento.fecha_hora_inicio = timezone.make_aware(datetime.combine(evento.fecha_inicio, evento.hora_inicio))
+        Modelo.objects.bulk_update(eventos, ['fecha_hora_inicio'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0007_evento_fecha_hora_inicio'),
+    ]
+
+    operations = [
+        migrations.RunPython(completar_fecha_hora_inicio, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='evento',
+            name='fecha_hora_inicio',
+            field=models.DateTimeField(db_index=True, editable=False, help_text='Se calcula al guardar a partir de la fecha y hora de inicio.', verbose_name='Fecha y hora de inicio'),
+        ),
+        migrations.AlterField(
+            model_name='historicalevento',
+            name='fecha_hora_inicio',
+            field=models.DateTimeField(db_index=True, editable=False, help_text='Se calcula al guardar a partir de la fecha y hora de inicio.', verbose_name='Fecha y hora de inicio'),
+        ),
+    ]
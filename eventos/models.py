@@ -1,24 +1,26 @@
 import base64
-import socket
+from collections import Counter
 from datetime import datetime, timedelta
-from io import BytesIO
 
-import qrcode
-from PIL import Image
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
 from django.core.mail import EmailMessage
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models, transaction
-from django.db.models import Q
+from django.db.models import Q, F, Sum
 from django.forms import model_to_dict
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
-from django_softdelete.models import SoftDeleteModel
+from django_softdelete.models import SoftDeleteModel, SoftDeleteQuerySet
 from num2words import num2words
-from qrcode.image.svg import SvgPathFillImage
 from simple_history.models import HistoricalRecords
+from simple_history.utils import bulk_update_with_history
+
+from core.images import registrar_imagen, get_imagen_url
+from core.parameters import get_parameters
+from eventos.qr import renderizar_qr, renderizar_lote, generar_token
 
 
 class Parameters(models.Model):
@@ -43,6 +45,21 @@ class Parameters(models.Model):
         verbose_name_plural = "Parámetros de eventos"
 
 
+class EventoQuerySet(SoftDeleteQuerySet):
+    """
+    QuerySet de los eventos.
+    """
+
+    def proximos(self):
+        """Eventos que todavía no comenzaron, ordenados por fecha y hora de inicio."""
+        return self.filter(fecha_hora_inicio__gt=timezone.now()).order_by('fecha_hora_inicio', 'pk')
+
+
+class EventoManager(models.Manager.from_queryset(EventoQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class Evento(SoftDeleteModel):
     """
     Modelo de los eventos.
@@ -53,6 +70,9 @@ class Evento(SoftDeleteModel):
     hora_inicio = models.TimeField(verbose_name='Hora de inicio')
     fecha_fin = models.DateField(verbose_name='Fecha de finalización')
     hora_fin = models.TimeField(verbose_name='Hora de finalización')
+    fecha_hora_inicio = models.DateTimeField(db_index=True, editable=False,
+                                             verbose_name='Fecha y hora de inicio',
+                                             help_text='Se calcula al guardar a partir de la fecha y hora de inicio.')
     registro_deadline = models.DateField(verbose_name='Fecha límite de registro', null=True, blank=True,
                                          help_text='Fecha límite para registrarse al evento. Si no se especifica, '
                                                    'no hay límite.')
@@ -66,6 +86,8 @@ class Evento(SoftDeleteModel):
     date_updated = models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')
     history = HistoricalRecords()
 
+    objects = EventoManager()
+
     def image_directory_path(self, filename):
         """
         Devuelve la ruta de la imagen de perfil del usuario.
@@ -82,12 +104,7 @@ class Evento(SoftDeleteModel):
         """
         Devuelve la imagen del evento.
         """
-        try:
-            # Si existe una imagen en self.imagen.url, la devuelve.
-            Image.open(self.imagen.path)
-            return self.imagen.url
-        except (FileNotFoundError, ValueError):
-            return settings.STATIC_URL + 'img/empty.svg'
+        return get_imagen_url(self.imagen)
 
     def get_expiration_date(self, isoformat=True):
         """
@@ -143,16 +160,14 @@ class Evento(SoftDeleteModel):
             raise ValidationError('La fecha y hora de inicio debe ser menor o igual a la fecha y hora de finalización.')
 
     def save(self, *args, **kwargs):
-        """Método save() sobrescrito para redimensionar la imagen."""
+        """
+        Método save() sobrescrito para guardar la fecha y hora de inicio, que se calcula en la señal pre_save, aunque
+        se indiquen los campos a actualizar, y para redimensionar la imagen y registrar sus datos.
+        """
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'fecha_hora_inicio'}
         super().save(*args, **kwargs)
-        try:
-            img = Image.open(self.imagen.path)
-            if img.height > 2000 or img.width > 2000:
-                output_size = (2000, 2000)
-                img.thumbnail(output_size)
-                img.save(self.imagen.path)
-        except FileNotFoundError:
-            pass
+        registrar_imagen(self.imagen, 2000)
 
     def toJSON(self):
         """
@@ -187,6 +202,8 @@ class TicketVariante(models.Model):
     nombre = models.CharField(max_length=255, verbose_name='Nombre')
     precio = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Precio')
     total_tickets = models.PositiveIntegerField(verbose_name='Total de tickets')
+    # Contador de stock: se descuenta y se devuelve con UPDATE condicionales desde eventos.inventory.
+    tickets_disponibles = models.PositiveIntegerField(default=0, editable=False, verbose_name='Tickets disponibles')
     date_created = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
     date_updated = models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')
     history = HistoricalRecords()
@@ -198,7 +215,34 @@ class TicketVariante(models.Model):
         """
         Devuelve la cantidad de tickets restantes.
         """
-        return self.total_tickets - self.ticket_set.filter(is_deleted=False).count()
+        return self.tickets_disponibles
+
+    def clean(self):
+        super(TicketVariante, self).clean()
+        if not self._state.adding and self.total_tickets is not None:
+            anterior = TicketVariante.objects.filter(pk=self.pk).values('total_tickets', 'tickets_disponibles').get()
+            vendidos = anterior['total_tickets'] - anterior['tickets_disponibles']
+            if self.total_tickets < vendidos:
+                raise ValidationError({'total_tickets': 'Ya se vendieron o están reservados {} tickets de esta '
+                                                        'variante.'.format(vendidos)})
+
+    def save(self, *args, **kwargs):
+        """
+        Método save() sobrescrito para mantener el contador de stock. Al editar no se escribe tickets_disponibles (que
+        puede estar cambiando por otras compras), sino que se le suma la diferencia del total de tickets.
+        """
+        if self._state.adding:
+            self.tickets_disponibles = self.total_tickets
+            return super().save(*args, **kwargs)
+        anterior = TicketVariante.objects.filter(pk=self.pk).values_list('total_tickets', flat=True).get()
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name != 'tickets_disponibles']
+        super().save(*args, **kwargs)
+        if self.total_tickets != anterior:
+            TicketVariante.objects.filter(pk=self.pk).update(
+                tickets_disponibles=F('tickets_disponibles') + self.total_tickets - anterior)
+            self.refresh_from_db(fields=['tickets_disponibles'])
 
     def toJSON(self):
         """
@@ -214,22 +258,86 @@ class TicketVariante(models.Model):
         verbose_name_plural = "Variantes de tickets"
 
 
+class RetencionTicketQuerySet(models.QuerySet):
+    """
+    QuerySet de las retenciones de tickets.
+    """
+
+    def expiradas(self):
+        """Retenciones cuya fecha de expiración ya pasó."""
+        return self.filter(fecha_expiracion__lt=timezone.now())
+
+
+class RetencionTicket(models.Model):
+    """
+    Modelo de las retenciones de tickets. Mientras el cliente completa la compra, los tickets elegidos quedan
+    descontados del stock de la variante; si la retención expira, se devuelven al stock.
+    """
+    ticket_variante = models.ForeignKey('eventos.TicketVariante', on_delete=models.CASCADE,
+                                        verbose_name='Variante de ticket')
+    cantidad = models.PositiveIntegerField(verbose_name='Cantidad')
+    fecha_expiracion = models.DateTimeField(db_index=True, verbose_name='Fecha de expiración')
+    date_created = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
+
+    objects = RetencionTicketQuerySet.as_manager()
+
+    def __str__(self):
+        return 'Retención de {} tickets {}'.format(self.cantidad, self.ticket_variante)
+
+    class Meta:
+        verbose_name = 'Retención de tickets'
+        verbose_name_plural = 'Retenciones de tickets'
+
+
+class AvisoEvento(models.Model):
+    """
+    Modelo de los avisos de cambios en un evento. Se registra un aviso por destinatario para enviarlos en segundo plano
+    y reintentar los que fallen; mientras un aviso está pendiente no se encola otro igual.
+    """
+    evento = models.ForeignKey('eventos.Evento', on_delete=models.CASCADE, verbose_name='Evento')
+    email = models.EmailField(verbose_name='Correo electrónico')
+    enviado = models.BooleanField(default=False, verbose_name='Enviado')
+    intentos = models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')
+    error = models.TextField(blank=True, verbose_name='Último error')
+    reservado_hasta = models.DateTimeField(null=True, blank=True, verbose_name='Reservado hasta',
+                                           help_text='Hasta esta fecha el aviso no se vuelve a intentar: lo está '
+                                                     'enviando una tarea o espera para reintentarse.')
+    date_created = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
+    date_sent = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de envío')
+
+    def __str__(self):
+        return 'Aviso de {} a {}'.format(self.evento, self.email)
+
+    class Meta:
+        verbose_name = 'Aviso de evento'
+        verbose_name_plural = 'Avisos de eventos'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['evento', 'email'],
+                condition=Q(enviado=False),
+                name='aviso_evento_pendiente_unico',
+            ),
+        ]
+
+
 def send_qr_code(ids, email=None):
     """
     Envía el código QR de cada ticket al correo del cliente. Solo se envía un correo al cliente.
     """
-    tickets = Ticket.objects.filter(pk__in=ids)
+    tickets = list(Ticket.objects.filter(pk__in=ids).select_related('ticket_variante__evento', 'venta_ticket'))
     if len(tickets) > 0:
         # Obtener los correos de los tickets.
         if not email:
-            emails = [ticket.venta_ticket.user.email for ticket in tickets]
+            emails = list({ticket.venta_ticket.email for ticket in tickets})
         else:
             emails = [email]
-        # Adjuntar los códigos QR de los tickets como archivos.
+        # Las imágenes de cada ticket se obtienen una sola vez y se usan en el cuerpo y en los adjuntos.
+        imagenes = generar_codigos_qr(tickets)
         attachments = []
         for ticket in tickets:
-            qr_code = ticket.get_qr_code(format_png=True)
-            attachments.append(('qr_{}_{}.png'.format('ticket', ticket.pk), qr_code, 'image/png'))
+            svg, png = imagenes[ticket.pk]
+            ticket.qr_code = 'data:image/svg+xml;utf8;base64,' + base64.b64encode(svg).decode()
+            attachments.append(('qr_{}_{}.png'.format('ticket', ticket.pk), png, 'image/png'))
         message = render_to_string('email/qr.html', {
             'tickets': tickets,
         })
@@ -244,6 +352,28 @@ def send_qr_code(ids, email=None):
         email.send()
 
 
+def generar_codigos_qr(tickets):
+    """
+    Genera en paralelo los códigos QR de los tickets que todavía no los tienen y lee del almacenamiento los del resto.
+    Devuelve un diccionario {ticket_id: (svg, png)} con las imágenes en bytes.
+    """
+    pendientes = [ticket for ticket in tickets if not ticket.qr_svg or not ticket.qr_png]
+    imagenes = {}
+    for ticket, (svg, png) in zip(pendientes, renderizar_lote([ticket.get_qr_string() for ticket in pendientes])):
+        ticket.guardar_qr(svg, png)
+        imagenes[ticket.pk] = (svg, png)
+    for ticket in tickets:
+        if ticket.pk not in imagenes:
+            imagenes[ticket.pk] = (ticket.leer_qr('svg'), ticket.leer_qr('png'))
+    return imagenes
+
+
+def enviar_codigos_qr_venta(venta_ticket_id):
+    """Genera y envía los códigos QR de los tickets de una venta. Se ejecuta en segundo plano al aprobarse el pago."""
+    venta_ticket = VentaTicket.objects.get(pk=venta_ticket_id)
+    send_qr_code(list(venta_ticket.ticket_set.values_list('pk', flat=True)), venta_ticket.email)
+
+
 class Ticket(SoftDeleteModel):
     """
     Modelo de los tickets.
@@ -261,31 +391,70 @@ class Ticket(SoftDeleteModel):
     date_updated = models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')
     history = HistoricalRecords()
 
+    def qr_directory_path(self, filename):
+        """Método para obtener la ruta de las imágenes del código QR del ticket."""
+        return 'qr/ticket/{0}/{1}'.format(self.pk, filename)
+
+    qr_svg = models.FileField(upload_to=qr_directory_path, null=True, blank=True, editable=False,
+                              verbose_name='Código QR (SVG)')
+    qr_png = models.FileField(upload_to=qr_directory_path, null=True, blank=True, editable=False,
+                              verbose_name='Código QR (PNG)')
+    qr_version = models.PositiveSmallIntegerField(default=1, editable=False, verbose_name='Versión del código QR')
+
     def __str__(self):
         return '{} - {} - {}'.format(self.ticket_variante.evento, self.ticket_variante.nombre, self.nombre)
 
+    def get_qr_token(self):
+        """
+        Devuelve el token firmado del código QR, con el id del ticket, el id del evento y la versión del código.
+        """
+        return generar_token(self.pk, self.ticket_variante.evento_id, self.qr_version)
+
+    def get_qr_string(self):
+        """
+        Devuelve el contenido del código QR: la url de check-in con el token del ticket, con la url base de la
+        configuración.
+        """
+        return settings.QR_BASE_URL.rstrip('/') + reverse('admin-tickets-qr', kwargs={'token': self.get_qr_token()})
+
+    def generar_qr(self):
+        """
+        Genera una sola vez las imágenes SVG y PNG del código QR y las guarda en el almacenamiento de archivos.
+        """
+        self.guardar_qr(*renderizar_qr(self.get_qr_string()))
+
+    def guardar_qr(self, svg, png):
+        """Guarda las imágenes SVG y PNG del código QR (en bytes) en el almacenamiento de archivos."""
+        self.qr_svg.save('ticket_{}.svg'.format(self.pk), ContentFile(svg), save=False)
+        self.qr_png.save('ticket_{}.png'.format(self.pk), ContentFile(png), save=False)
+        # No se usa save() para no registrar en el historial un cambio que no modifica al ticket.
+        Ticket.objects.filter(pk=self.pk).update(qr_svg=self.qr_svg.name, qr_png=self.qr_png.name)
+
+    def regenerar_qr(self):
+        """
+        Genera un código QR nuevo para el ticket, por ejemplo si el anterior se filtró: al cambiar la versión, el token
+        del código anterior deja de ser válido.
+        """
+        Ticket.objects.filter(pk=self.pk).update(qr_version=F('qr_version') + 1)
+        self.refresh_from_db(fields=['qr_version'])
+        self.generar_qr()
+
+    def leer_qr(self, formato):
+        """Devuelve en bytes la imagen del código QR guardada en el formato indicado (svg o png)."""
+        with getattr(self, 'qr_{}'.format(formato)).open('rb') as archivo:
+            return archivo.read()
+
     def get_qr_code(self, format_png=False):
         """
-        Devuelve el código QR del ticket.
-        """
-        factory = SvgPathFillImage
-        url = reverse('admin-tickets-qr', kwargs={'pk': self.pk})
-        hostname = socket.gethostname()
-        ip_address = socket.gethostbyname(hostname)
-        qr_string = "http://{}:8000".format(ip_address) + url
-        img = qrcode.make(qr_string, image_factory=factory, box_size=20, border=1)
-        stream = BytesIO()
-        img.save(stream)
-        base64_data = base64.b64encode(stream.getvalue()).decode()
-        # Pasar a formato PNG para adjuntar en el correo.
+        Devuelve el código QR del ticket desde el almacenamiento: el PNG en bytes o el SVG como data URI. Si el ticket
+        todavía no tiene las imágenes se generan.
+        """
+        if not self.qr_svg or not self.qr_png:
+            self.generar_qr()
+        contenido = self.leer_qr('png' if format_png else 'svg')
         if format_png:
-            # Crear QR en formato PNG.
-            img = qrcode.make(qr_string, box_size=20, border=1)
-            stream = BytesIO()
-            img.save(stream)
-            base64_data = base64.b64encode(stream.getvalue()).decode()
-            return base64.b64decode(base64_data)
-        return 'data:image/svg+xml;utf8;base64,' + base64_data
+            return contenido
+        return 'data:image/svg+xml;utf8;base64,' + base64.b64encode(contenido).decode()
 
     def get_precio_compra(self):
         """
@@ -331,6 +500,56 @@ class Ticket(SoftDeleteModel):
         ]
 
 
+class VentaTicketQuerySet(SoftDeleteQuerySet):
+    """
+    QuerySet de las ventas de tickets.
+    """
+
+    def expiradas(self, club_id=1):
+        """Ventas que no fueron pagadas dentro de los minutos de expiración."""
+        minutos = get_parameters(Parameters, club_id).minutos_expiracion_venta
+        return self.filter(pagado=False, date_created__lt=timezone.now() - timedelta(minutes=minutos))
+
+    def vigentes(self, club_id=1):
+        """Ventas que no expiraron por falta de pago."""
+        minutos = get_parameters(Parameters, club_id).minutos_expiracion_venta
+        return self.exclude(pagado=False, date_created__lt=timezone.now() - timedelta(minutes=minutos))
+
+    def recaudacion_por_evento(self):
+        """
+        Devuelve {evento_id: total} con la recaudación de las ventas del queryset (subtotal menos el descuento),
+        calculada en la base de datos con un único GROUP BY evento.
+        """
+        # Se suma subtotal * (100 - porcentaje) y se divide por 100 al final: en SQLite la división de dos valores
+        # enteros trunca el resultado.
+        return {fila['evento']: fila['total'] / 100 for fila in self.order_by().values('evento').annotate(
+            total=Sum(F('subtotal') * (100 - F('porcentaje_descuento')),
+                      output_field=models.DecimalField(max_digits=20, decimal_places=4)))}
+
+    def expirar(self):
+        """Da de baja en lote las ventas del queryset y sus tickets, registrando el motivo en el historial."""
+        from eventos.inventory import devolver
+        with transaction.atomic():
+            ventas = list(self.filter(is_deleted=False))
+            tickets = list(Ticket.objects.filter(venta_ticket__in=ventas))
+            deleted_at = timezone.now()
+            for obj in ventas + tickets:
+                obj.is_deleted = True
+                obj.deleted_at = deleted_at
+            bulk_update_with_history(tickets, Ticket, ['is_deleted', 'deleted_at'],
+                                     default_change_reason='Venta expirada por falta de pago')
+            bulk_update_with_history(ventas, VentaTicket, ['is_deleted', 'deleted_at'],
+                                     default_change_reason='Expirada por falta de pago')
+            # Los tickets de las ventas expiradas vuelven al stock.
+            devolver(Counter(ticket.ticket_variante_id for ticket in tickets))
+        return len(ventas)
+
+
+class VentaTicketManager(models.Manager.from_queryset(VentaTicketQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class VentaTicket(SoftDeleteModel):
     """
     Modelo de las ventas de tickets.
@@ -344,10 +563,12 @@ class VentaTicket(SoftDeleteModel):
     pagado = models.BooleanField(default=False, verbose_name='Pagado', help_text='Marcar si el cliente ya pagó')
     preference_id = models.CharField(max_length=255, null=True, blank=True, verbose_name='Preference ID',
                                      help_text='ID de la preferencia de pago de Mercado Pago')
-    date_created = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
+    date_created = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Fecha de creación')
     date_updated = models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')
     history = HistoricalRecords()
 
+    objects = VentaTicketManager()
+
     def __str__(self):
         return 'VentaTicket #{}'.format(self.pk)
 
@@ -363,7 +584,7 @@ class VentaTicket(SoftDeleteModel):
         """
         Devuelve la fecha de expiración de la venta.
         """
-        minutos = Parameters.objects.get(club_id=1).minutos_expiracion_venta
+        minutos = get_parameters(Parameters).minutos_expiracion_venta
         return (self.date_created + timedelta(minutes=minutos)).isoformat() if isoformat else \
             self.date_created + timedelta(minutes=minutos)
 
@@ -396,17 +617,21 @@ class VentaTicket(SoftDeleteModel):
         except PagoVentaTicket.DoesNotExist:
             return 'Pendiente'
 
+    def is_expired(self):
+        """
+        Devuelve True si la venta expiró por falta de pago.
+        """
+        return bool(self.date_created) and not self.pagado and \
+            self.get_expiration_date(isoformat=False) < timezone.now()
+
     def clean(self):
         """Método clean() sobrescrito para validar la reserva."""
         super(VentaTicket, self).clean()
-        # Si pasó la fecha de expiración de la reserva y no se ha pagado, se cancela.
-        if self.date_created:
-            if self.get_expiration_date(isoformat=False) < timezone.now() and not self.pagado:
-                print('La venta de ticket #{} ha expirado por falta de pago.'.format(self.id))
-                with transaction.atomic():
-                    self.delete(cascade=True)
-                raise ValidationError('La venta de ticket #{} ha expirado por falta de pago.'.format(self.id),
-                                      code='invalid', params={'id': self.id})
+        # Si pasó la fecha de expiración de la venta y no se ha pagado, no es válida. La baja la realiza el
+        # comando expirar_pendientes.
+        if self.is_expired():
+            raise ValidationError('La venta de ticket #{} ha expirado por falta de pago.'.format(self.id),
+                                  code='invalid', params={'id': self.id})
 
     def toJSON(self):
         """
@@ -0,0 +1,94 @@
+#  Este archivo contiene el envío de avisos de cambios en los eventos para la app eventos
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q, F
+from django.utils import timezone
+
+from core.tasks import ejecutar_en_segundo_plano
+from eventos.models import AvisoEvento, VentaTicket
+
+TAMANO_LOTE = 50
+MAX_INTENTOS = 5
+MINUTOS_RESERVA = 10
+MINUTOS_REINTENTO = 5
+
+
+def encolar_aviso_actualizacion(evento):
+    """
+    Registra un aviso por cada correo distinto de las ventas del evento y los envía en segundo plano. Si un
+    destinatario ya tiene un aviso pendiente del evento no se registra otro, y se reinician sus intentos.
+    """
+    emails = VentaTicket.objects.filter(evento=evento).order_by().values_list('email', flat=True).distinct()
+    AvisoEvento.objects.filter(evento=evento, enviado=False).update(intentos=0, reservado_hasta=None)
+    AvisoEvento.objects.bulk_create([AvisoEvento(evento=evento, email=email) for email in emails],
+                                    ignore_conflicts=True)
+    ejecutar_en_segundo_plano(enviar_avisos, evento.pk)
+
+
+def get_pendientes(evento_id=None):
+    """Devuelve los avisos sin enviar, con intentos disponibles y que no estén reservados."""
+    avisos = AvisoEvento.objects.filter(
+        Q(reservado_hasta=None) | Q(reservado_hasta__lt=timezone.now()), enviado=False, intentos__lt=MAX_INTENTOS)
+    return avisos.filter(evento_id=evento_id) if evento_id else avisos
+
+
+def reservar_lote(evento_id=None):
+    """
+    Reserva un lote de avisos pendientes con un UPDATE condicional, para que dos tareas no envíen el mismo aviso.
+    Devuelve los avisos reservados.
+    """
+    reservado_hasta = timezone.now() + timedelta(minutes=MINUTOS_RESERVA)
+    ids = list(get_pendientes(evento_id).order_by('pk').values_list('pk', flat=True)[:TAMANO_LOTE])
+    get_pendientes(evento_id).filter(pk__in=ids).update(reservado_hasta=reservado_hasta)
+    return list(AvisoEvento.objects.filter(pk__in=ids, reservado_hasta=reservado_hasta).select_related('evento'))
+
+
+def marcar_fallidos(ids, error):
+    """Registra un intento fallido de los avisos indicados y los deja esperando MINUTOS_REINTENTO para reintentarse."""
+    AvisoEvento.objects.filter(pk__in=ids).update(
+        intentos=F('intentos') + 1, error=error, reservado_hasta=timezone.now() + timedelta(minutes=MINUTOS_REINTENTO))
+
+
+def enviar_avisos(evento_id=None):
+    """
+    Envía los avisos pendientes (de un evento o de todos) en lotes, reutilizando una sola conexión SMTP. Cada correo
+    tiene un solo destinatario, para no exponer las direcciones de los demás. Los avisos que fallan se reintentan más
+    tarde, hasta MAX_INTENTOS veces; si no se puede abrir la conexión, falla todo el lote reservado y no se reservan
+    más. Devuelve (enviados, fallidos).
+    """
+    enviados = fallidos = 0
+    connection = get_connection()
+    try:
+        while True:
+            avisos = reservar_lote(evento_id)
+            if not avisos:
+                break
+            try:
+                # Si la conexión ya está abierta, open() no hace nada.
+                connection.open()
+            except Exception as e:
+                marcar_fallidos([aviso.pk for aviso in avisos], str(e))
+                fallidos += len(avisos)
+                break
+            ids = []
+            for aviso in avisos:
+                mensaje = 'El evento {} ha sido actualizado'.format(aviso.evento.nombre)
+                email = EmailMessage('Evento Actualizado', mensaje, settings.DEFAULT_FROM_EMAIL, [aviso.email],
+                                     connection=connection)
+                try:
+                    email.send()
+                    ids.append(aviso.pk)
+                except Exception as e:
+                    marcar_fallidos([aviso.pk], str(e))
+                    fallidos += 1
+            AvisoEvento.objects.filter(pk__in=ids).update(enviado=True, intentos=F('intentos') + 1, error='',
+                                                          reservado_hasta=None, date_sent=timezone.now())
+            enviados += len(ids)
+    finally:
+        connection.close()
+    if enviados or fallidos:
+        print('Avisos de eventos enviados: {}. Fallidos: {}.'.format(enviados, fallidos))
+    return enviados, fallidos
@@ -0,0 +1,64 @@
+#  Este archivo contiene el renderizado de los códigos QR de los tickets para la app eventos
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import qrcode
+from django.utils.crypto import salted_hmac, constant_time_compare
+from qrcode.image.svg import SvgPathFillImage
+
+_pool = None
+
+
+def get_firma(ticket_id, evento_id, version):
+    """Devuelve la firma (HMAC con la clave del proyecto) del token del código QR de un ticket."""
+    return salted_hmac('eventos.qr', '{}.{}.{}'.format(ticket_id, evento_id, version)).hexdigest()[:16]
+
+
+def generar_token(ticket_id, evento_id, version):
+    """Devuelve el token firmado que lleva el código QR del ticket: id del ticket, id del evento, versión y firma."""
+    return '{}.{}.{}.{}'.format(ticket_id, evento_id, version, get_firma(ticket_id, evento_id, version))
+
+
+def leer_token(token):
+    """
+    Verifica la firma del token sin consultar la base de datos. Devuelve (ticket_id, evento_id, version) o None si el
+    token está mal formado o fue alterado.
+    """
+    partes = (token or '').split('.')
+    if len(partes) != 4 or not all(parte.isdigit() for parte in partes[:3]):
+        return None
+    ticket_id, evento_id, version = (int(parte) for parte in partes[:3])
+    if not constant_time_compare(partes[3], get_firma(ticket_id, evento_id, version)):
+        return None
+    return ticket_id, evento_id, version
+
+
+def renderizar_qr(qr_string):
+    """Renderiza el código QR con el contenido indicado. Devuelve (svg, png) en bytes."""
+    imagenes = []
+    for factory in (SvgPathFillImage, None):
+        img = qrcode.make(qr_string, image_factory=factory, box_size=20, border=1)
+        stream = BytesIO()
+        img.save(stream)
+        imagenes.append(stream.getvalue())
+    return tuple(imagenes)
+
+
+def get_pool():
+    """
+    Devuelve el pool de procesos para renderizar códigos QR. Se crea una sola vez por proceso y con 'spawn', para no
+    copiar hilos ni conexiones del servidor en los procesos hijos.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def renderizar_lote(qr_strings):
+    """Renderiza los códigos QR en paralelo, en el mismo orden. Devuelve una lista de (svg, png)."""
+    if len(qr_strings) <= 1:
+        return [renderizar_qr(qr_string) for qr_string in qr_strings]
+    return list(get_pool().map(renderizar_qr, qr_strings))
@@ -0,0 +1,14 @@
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from eventos.models import Evento
+
+
+@receiver(pre_save, sender=Evento)
+def calcular_fecha_hora_inicio(sender, instance, **kwargs):
+    """
+    Guarda la fecha y hora de inicio del evento (indexada, para listar los próximos eventos en la base de datos). Se
+    calcula en la señal y no en save() para que también se guarde al cargar eventos con loaddata.
+    """
+    instance.fecha_hora_inicio = timezone.make_aware(instance.get_start_datetime())
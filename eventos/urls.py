@@ -11,11 +11,15 @@ urlpatterns = [
     path('admin/eventos/crear/', EventoAdminCreateView.as_view(), name='admin-eventos-crear'),
     path('admin/eventos/<int:pk>/editar/', EventoAdminUpdateView.as_view(), name='admin-eventos-editar'),
     path('admin/eventos/<int:pk>/baja/', EventoAdminDeleteView.as_view(), name='admin-eventos-baja'),
+    path('admin/eventos/<int:pk>/manifiesto/', TicketAdminManifiestoView.as_view(), name='admin-eventos-manifiesto'),
+    path('admin/eventos/<int:pk>/sincronizar/', TicketAdminSincronizarView.as_view(),
+         name='admin-eventos-sincronizar'),
 
     path('admin/tickets/', lambda request: redirect('admin-tickets-listado', permanent=True), name='admin-tickets'),
     path('admin/tickets/listado/', TicketAdminListView.as_view(), name='admin-tickets-listado'),
     path('admin/tickets/<int:pk>/', TicketAdminDetailView.as_view(), name='admin-tickets-detalle'),
-    path('admin/tickets/<int:pk>/qr/', TicketAdminQRView.as_view(), name='admin-tickets-qr'),
+    path('admin/tickets/qr/<str:token>/', TicketAdminQRView.as_view(), name='admin-tickets-qr'),
+    path('admin/tickets/check-in/', TicketAdminCheckInView.as_view(), name='admin-tickets-check-in'),
 
     path('admin/ticket_variante/<int:pk>/delete/', delete_ticket_variante, name='admin-ticket-variante-delete'),
 
@@ -34,4 +38,5 @@ urlpatterns = [
     path('venta_ticket/<int:pk>/comprobante/', VentaTicketUserReceiptView.as_view(), name='venta-ticket-comprobante'),
     path('venta_ticket/<int:pk>/tickets/', TicketUserListView.as_view(), name='tickets-listado'),
     path('tickets/<int:pk>/', TicketUserDetailView.as_view(), name='tickets-detalle'),
+    path('tickets/<int:pk>/qr.<str:formato>', TicketQRImageView.as_view(), name='tickets-qr-imagen'),
 ]
@@ -1,9 +1,7 @@
 from datetime import datetime
 
-from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
-from django.core.mail import send_mail
 from django.db import transaction
 from django.db.models import ProtectedError
 from django.shortcuts import redirect, get_object_or_404
@@ -12,6 +10,7 @@ from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 
 from eventos.forms import EventoForm, TicketVarianteFormSet
 from eventos.models import Evento, TicketVariante
+from eventos.notifications import encolar_aviso_actualizacion
 
 
 class EventoAdminListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
@@ -99,7 +98,7 @@ class EventoAdminUpdateView(LoginRequiredMixin, PermissionRequiredMixin, EventoI
             return {'ticketvariante': TicketVarianteFormSet(self.request.POST or None, instance=self.object,
                                                             prefix='ticketvariante')}
 
-    # Si el formulario es valido, se guarda el evento y se guardan las variantes de ticket y se envia un correo
+    # Si el formulario es valido, se guarda el evento y se guardan las variantes de ticket y se encola un correo
     # a los usuarios que tienen tickets de ese evento
     def form_valid(self, form):
         named_formsets = self.get_named_formsets()
@@ -117,16 +116,8 @@ class EventoAdminUpdateView(LoginRequiredMixin, PermissionRequiredMixin, EventoI
             else:
                 formset.save()
         if not self.object.get_end_datetime() < datetime.now():
-            # Se envia un correo a los usuarios que tienen tickets de ese evento
-            emails = []
-            for venta in self.object.ventaticket_set.all():
-                emails.append(venta.email)
-            # utilizar send_mass_mail() para enviar los correos a todos los emails
-            send_mail('Evento Actualizado',
-                      'El evento ' + self.object.nombre + ' ha sido actualizado',
-                      settings.DEFAULT_FROM_EMAIL,
-                      emails,
-                      fail_silently=True)
+            # Se avisa en segundo plano a los compradores de tickets de ese evento, un correo por destinatario
+            encolar_aviso_actualizacion(self.object)
         messages.success(self.request, 'Evento actualizado correctamente')
         return redirect('admin-eventos-listado')
 
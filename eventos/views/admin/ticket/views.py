@@ -1,26 +1,42 @@
+import json
+from collections import Counter
 from datetime import datetime
 
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
+from django.core.exceptions import PermissionDenied
 from django.db import transaction
 from django.http import JsonResponse
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+from django.urls import reverse
 from django.views import View
 from django.views.generic import ListView, DetailView
 
+from config.mixins import DataTableMixin
 from core.models import Club
-from eventos.models import Ticket, send_qr_code
+from core.tasks import ejecutar_en_segundo_plano
+from eventos import inventory, checkin
+from eventos.checkin import registrar_ingreso, leer_codigo, generar_manifiesto, sincronizar_ingresos
+from eventos.qr import leer_token
+from eventos.models import Evento, Ticket, send_qr_code
 
 
-class TicketAdminListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class TicketAdminListView(LoginRequiredMixin, PermissionRequiredMixin, DataTableMixin, ListView):
     model = Ticket
     template_name = 'admin/ticket/list.html'
     context_object_name = 'tickets'
     permission_required = 'eventos.view_ticket'
+    datatable_values = ['id', 'ticket_variante__evento__nombre', 'ticket_variante__nombre', 'nombre', 'is_used']
+    datatable_search_fields = ['id', 'ticket_variante__evento__nombre', 'ticket_variante__nombre', 'nombre']
+    datatable_default_order = ['-date_created']
 
     def get_queryset(self):
-        return Ticket.objects.all().values('id', 'ticket_variante__evento__nombre', 'ticket_variante__nombre', 'nombre',
-                                           'is_used').order_by('-date_created')
+        return Ticket.objects.all()
+
+    def get_datatable_row(self, row):
+        row['url_detalle'] = reverse('admin-tickets-detalle', args=[row['id']])
+        return row
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -50,10 +66,13 @@ class TicketAdminListView(LoginRequiredMixin, PermissionRequiredMixin, ListView)
             elif action == 'delete_lote':
                 change_reason = request.POST['change_reason']
                 ids = request.POST.getlist('ids[]')
-                tickets = Ticket.objects.filter(pk__in=ids)
-                for ticket in tickets:
-                    ticket._change_reason = change_reason
-                tickets.delete()
+                with transaction.atomic():
+                    tickets = Ticket.objects.filter(pk__in=ids)
+                    for ticket in tickets:
+                        ticket._change_reason = change_reason
+                    cantidades = Counter(tickets.values_list('ticket_variante_id', flat=True))
+                    tickets.delete()
+                    inventory.devolver(cantidades)
             else:
                 data['error'] = 'No ha seleccionado ninguna opción'
         except Exception as e:
@@ -77,13 +96,19 @@ class TicketAdminDetailView(LoginRequiredMixin, PermissionRequiredMixin, DetailV
         data = {}
         try:
             action = request.POST['action']
-            email = request.POST['email']
             if action == 'send_qr':
+                email = request.POST['email']
                 ticket = Ticket.objects.filter(pk=self.kwargs['pk']).first()
                 if ticket:
-                    send_qr_code([ticket.pk], email)
+                    ejecutar_en_segundo_plano(send_qr_code, [ticket.pk], email)
                 messages.success(request, 'El código QR se ha enviado correctamente')
                 return redirect('admin-tickets-detalle', pk=self.kwargs['pk'])
+            elif action == 'regenerar_qr':
+                if not request.user.has_perm('eventos.change_ticket'):
+                    raise PermissionDenied('No tiene permiso para regenerar el código QR')
+                Ticket.objects.select_related('ticket_variante').get(pk=self.kwargs['pk']).regenerar_qr()
+                messages.success(request, 'Se generó un nuevo código QR, el anterior ya no es válido')
+                return redirect('admin-tickets-detalle', pk=self.kwargs['pk'])
             else:
                 data['error'] = 'No ha seleccionado ninguna opción'
         except Exception as e:
@@ -97,45 +122,103 @@ class TicketAdminQRView(LoginRequiredMixin, PermissionRequiredMixin, View):
     permission_required = 'eventos.change_ticket'
 
     def get(self, request, *args, **kwargs):
-        try:
-            ticket = Ticket.objects.get(pk=self.kwargs['pk'])
-            venta_ticket = ticket.venta_ticket
-            if not venta_ticket.pagado:
-                raise ValueError('El ticket no ha sido pagado')
-            if not ticket.is_used:
-                with transaction.atomic():
-                    ticket.is_used = True
-                    ticket.check_date = datetime.now()
-                    ticket.check_by = request.user
-                    ticket.save()
-                return render(request, 'admin/ticket/qr.html', {
-                    'title': 'Código QR del Ticket',
-                    'ticket': ticket,
-                    'icon': 'success',
-                    'success': True})
-            else:
-                return render(request, 'admin/ticket/qr.html', {
-                    'title': 'Código QR del Ticket',
-                    'ticket': ticket,
-                    'icon': 'error',
-                    'error': 'is_used',
-                    'check_date': ticket.check_date,
-                    'check_by': ticket.check_by,
-                    'text': 'El ticket ya ha sido usado',
-                    'success': False})
-        except Ticket.DoesNotExist:
+        # El token se verifica en memoria: un código alterado se rechaza sin consultar la base de datos.
+        token = leer_token(self.kwargs['token'])
+        resultado, datos = registrar_ingreso(token[0], token[2], request.user) if token else (checkin.INEXISTENTE, None)
+        if resultado in (checkin.INEXISTENTE, checkin.NO_PAGADO, checkin.REVOCADO):
             return render(request, 'admin/ticket/qr.html', {
                 'title': 'Código QR del Ticket',
                 'ticket': None,
                 'icon': 'error',
-                'error': 'El ticket no existe o el código QR no es válido',
+                'error': checkin.MENSAJES[resultado],
                 'success': False
             })
-        except ValueError as e:
+        ticket = Ticket.objects.select_related('ticket_variante__evento', 'check_by').get(pk=token[0])
+        if resultado == checkin.ADMITIDO:
             return render(request, 'admin/ticket/qr.html', {
                 'title': 'Código QR del Ticket',
-                'ticket': None,
-                'icon': 'error',
-                'error': e.args[0],
-                'success': False
-            })
+                'ticket': ticket,
+                'icon': 'success',
+                'success': True})
+        return render(request, 'admin/ticket/qr.html', {
+            'title': 'Código QR del Ticket',
+            'ticket': ticket,
+            'icon': 'error',
+            'error': 'is_used',
+            'check_date': ticket.check_date,
+            'check_by': ticket.check_by,
+            'text': checkin.MENSAJES[resultado],
+            'success': False})
+
+
+class TicketAdminCheckInView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """
+    Vista del escáner de la puerta. El GET muestra el lector de códigos QR y el POST registra el ingreso del ticket
+    escaneado, devolviendo un JSON breve. Los códigos con la firma inválida o de otro evento que el elegido en el
+    escáner se rechazan antes de consultar la base de datos.
+    """
+    permission_required = 'eventos.change_ticket'
+
+    def get(self, request, *args, **kwargs):
+        return render(request, 'admin/ticket/scanner_qr.html', {
+            'title': 'Escáner de Tickets',
+            'eventos': Evento.objects.filter(fecha_fin__gte=timezone.localdate()).order_by('fecha_inicio')})
+
+    def post(self, request, *args, **kwargs):
+        data = {}
+        try:
+            token = leer_codigo(request.POST.get('codigo'))
+            evento = request.POST.get('evento')
+            if token is None:
+                resultado, datos = checkin.INEXISTENTE, None
+            elif evento and int(evento) != token[1]:
+                resultado, datos = checkin.EVENTO_INCORRECTO, None
+            else:
+                resultado, datos = registrar_ingreso(token[0], token[2], request.user)
+            data['resultado'] = resultado
+            data['mensaje'] = checkin.MENSAJES[resultado]
+            if datos:
+                data['ticket'] = {
+                    'id': datos['id'],
+                    'nombre': datos['nombre'],
+                    'dni': datos['dni'],
+                    'evento': datos['ticket_variante__evento__nombre'],
+                    'tipo': datos['ticket_variante__nombre'],
+                    'check_date': datos['check_date'].strftime('%d/%m/%Y %H:%M:%S') if datos['check_date'] else None,
+                    'check_by': datos['check_by__email'],
+                }
+        except Exception as e:
+            data['error'] = e.args[0]
+        return JsonResponse(data)
+
+
+class TicketAdminManifiestoView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """
+    Devuelve el manifiesto de check-in del evento, para que el escáner valide los tickets sin conexión.
+    """
+    permission_required = 'eventos.change_ticket'
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(generar_manifiesto(get_object_or_404(Evento, pk=self.kwargs['pk'])))
+
+
+class TicketAdminSincronizarView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """
+    Aplica en lote los ingresos que el escáner registró sin conexión y devuelve los conflictos, junto con los tickets
+    del evento que ya se usaron para actualizar el manifiesto del dispositivo.
+    """
+    permission_required = 'eventos.change_ticket'
+
+    def post(self, request, *args, **kwargs):
+        data = {}
+        try:
+            evento = get_object_or_404(Evento, pk=self.kwargs['pk'])
+            ingresos = json.loads(request.body).get('ingresos', [])
+            data['aplicados'], data['conflictos'] = sincronizar_ingresos(evento, ingresos, request.user)
+            for conflicto in data['conflictos']:
+                conflicto['mensaje'] = checkin.MENSAJES[conflicto['motivo']]
+            data['usados'] = list(Ticket.objects.filter(ticket_variante__evento=evento, is_used=True).values_list(
+                'id', flat=True))
+        except Exception as e:
+            data['error'] = e.args[0]
+        return JsonResponse(data)
@@ -6,16 +6,22 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.exceptions import ValidationError
 from django.db import transaction, IntegrityError
+from django.http import FileResponse, Http404
 from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.views import View
 from django.views.generic import TemplateView, DetailView, ListView
 from num2words import num2words
+from simple_history.utils import bulk_create_with_history
 
 from core.models import Club
+from core.parameters import get_parameters
+from core.tasks import ejecutar_en_segundo_plano
 from core.utilities import send_email
+from eventos import inventory
+from eventos.cache import get_version_tarjetas, TIMEOUT_TARJETAS
 from eventos.models import Evento, TicketVariante, VentaTicket, Ticket, ItemVentaTicket, PagoVentaTicket, Parameters, \
-    send_qr_code
+    RetencionTicket, enviar_codigos_qr_venta
 from static.credentials import MercadoPagoCredentials  # Aquí debería insertar sus credenciales de MercadoPago
 
 public_key = MercadoPagoCredentials.get_public_key()
@@ -33,13 +39,6 @@ class EventoUserDetailView(DetailView):
 
     def dispatch(self, request, *args, **kwargs):
         evento = self.get_object()
-        try:
-            ticket_variantes = TicketVariante.objects.filter(evento=evento)
-            venta_tickets = VentaTicket.objects.filter(itemventaticket__ticket_variante__in=ticket_variantes)
-            for venta_ticket in venta_tickets:
-                venta_ticket.clean()
-        except (TicketVariante.DoesNotExist, VentaTicket.DoesNotExist, ValidationError):
-            pass
         if evento.get_expiration_date(isoformat=False) < datetime.now().date():
             messages.error(request, 'El evento ya no se encuentra disponible para la compra de tickets')
             return redirect('index')
@@ -60,7 +59,7 @@ class EventoUserDetailView(DetailView):
                 tickets = []
                 items = []
                 subtotal = 0
-                max_tickets_por_venta = Parameters.objects.get(pk=1).max_tickets_por_venta
+                max_tickets_por_venta = get_parameters(Parameters).max_tickets_por_venta
                 cantidad_tickets = 0
                 for ticket_variante in TicketVariante.objects.filter(evento=evento):
                     # Se obtiene la cantidad de tickets de la variante
@@ -69,10 +68,6 @@ class EventoUserDetailView(DetailView):
                         continue
                     cantidad = int(cantidad)
                     cantidad_tickets += cantidad
-                    if cantidad > ticket_variante.get_tickets_restantes():
-                        messages.error(request,
-                                       'No hay suficientes tickets {} disponibles'.format(ticket_variante.nombre))
-                        return redirect('eventos-detalle', pk=evento.pk)
                     items.append({
                         'ticket_variante_id': ticket_variante.pk,
                         'ticket_variante': ticket_variante.nombre,
@@ -94,6 +89,14 @@ class EventoUserDetailView(DetailView):
                 if cantidad_tickets > max_tickets_por_venta:
                     messages.error(request, 'No se pueden comprar más de {} tickets'.format(max_tickets_por_venta))
                     return redirect('eventos-detalle', pk=evento.pk)
+                # Se liberan los tickets de una orden anterior y se retienen los nuevos hasta que se complete la compra
+                inventory.liberar(RetencionTicket.objects.filter(pk__in=request.session.get('retenciones', [])))
+                try:
+                    retenciones = inventory.retener({item['ticket_variante_id']: item['cantidad'] for item in items})
+                except ValidationError as e:
+                    messages.error(request, e.args[0])
+                    return redirect('eventos-detalle', pk=evento.pk)
+                request.session['retenciones'] = retenciones
                 # Guardar en sesión los datos de la venta
                 # Si el usuario está logueado, y es socio, se le aplica el descuento
                 if request.user.is_authenticated and request.user.get_socio():
@@ -117,13 +120,6 @@ class EventoUserOrderView(TemplateView):
         except (Evento.DoesNotExist, KeyError):
             messages.error(request, 'No se ha seleccionado ningún evento')
             return redirect('index')
-        try:
-            ticket_variantes = TicketVariante.objects.filter(evento=evento)
-            venta_tickets = VentaTicket.objects.filter(itemventaticket__ticket_variante__in=ticket_variantes)
-            for venta_ticket in venta_tickets:
-                venta_ticket.clean()
-        except (TicketVariante.DoesNotExist, VentaTicket.DoesNotExist, ValidationError):
-            pass
         if evento.get_expiration_date(isoformat=False) < datetime.now().date():
             messages.error(request, 'El evento ya ha expirado.')
             return redirect('index')
@@ -164,17 +160,8 @@ class EventoUserOrderView(TemplateView):
             if items is None or tickets is None or subtotal is None:
                 messages.error(request, 'No se ha seleccionado ningún ticket')
                 return redirect('eventos-detalle', pk=evento.pk)
-            i = 0
-            for ticket in tickets:
-                # Volver a armar el diccionario con los datos de los tickets ahora con el nombre de la persona
-                ticket_variante = TicketVariante.objects.get(pk=ticket['ticket_variante_id'])
-                tickets[i] = {
-                    'ticket_variante_id': ticket_variante.pk,
-                    'ticket_variante': ticket_variante.__str__(),
-                    'dni': request.POST.get(f'dni_{ticket_variante.pk}_{i}'),
-                    'nombre': request.POST.get(f'nombre_{ticket_variante.pk}_{i}'),
-                }
-                i += 1
+            # Se obtienen todas las variantes de la orden en una sola consulta
+            variantes = TicketVariante.objects.in_bulk({ticket['ticket_variante_id'] for ticket in tickets})
             try:
                 with transaction.atomic():
                     # Se crea la venta
@@ -186,36 +173,39 @@ class EventoUserOrderView(TemplateView):
                         porcentaje_descuento=descuento_socio,
                         pagado=False,
                     )
-                    # Se crean los items de la venta
-                    for item in items:
-                        ItemVentaTicket.objects.create(
+                    # Los tickets retenidos pasan a ser de la venta.
+                    inventory.confirmar(request.session.get('retenciones', []),
+                                        {item['ticket_variante_id']: item['cantidad'] for item in items})
+                    # Se crean los items y los tickets de la venta en lote, con sus registros de historial
+                    items_venta = bulk_create_with_history([
+                        ItemVentaTicket(
                             venta_ticket=venta,
-                            ticket_variante_id=item['ticket_variante_id'],
+                            ticket_variante=variantes[item['ticket_variante_id']],
                             cantidad=item['cantidad'],
                             subtotal=item['subtotal']
-                        )
-                    # Se crean los tickets
-                    for ticket in tickets:
-                        Ticket.objects.create(
+                        ) for item in items], ItemVentaTicket)
+                    tickets_venta = bulk_create_with_history([
+                        Ticket(
                             venta_ticket=venta,
-                            ticket_variante_id=ticket['ticket_variante_id'],
-                            dni=ticket['dni'],
-                            nombre=ticket['nombre'],
+                            ticket_variante=variantes[ticket['ticket_variante_id']],
+                            dni=request.POST.get(f'dni_{ticket["ticket_variante_id"]}_{i}'),
+                            nombre=request.POST.get(f'nombre_{ticket["ticket_variante_id"]}_{i}'),
                             is_used=False
-                        )
-                    # Enviar correo con el link de pago.
-                    subject = 'Compra de Tickets - Pago Pendiente'
-                    template = 'email/evento_payment_link.html'
-                    context = {'venta': venta,
-                               'items': venta.itemventaticket_set.all(),
-                               'tickets': venta.ticket_set.all(),
-                               'protocol': 'https' if self.request.is_secure() else 'http',
-                               'domain': get_current_site(request)}
-                    send_email(subject, template, context, venta.email)
-                    messages.success(request, 'Se ha enviado un correo electrónico con el link de pago.')
+                        ) for i, ticket in enumerate(tickets)], Ticket)
+                request.session.pop('retenciones', None)
             except (IntegrityError, ValidationError, Exception) as e:
                 messages.error(request, 'No se ha podido crear la venta, error: {}'.format(e))
                 return redirect('eventos-orden')
+            # Enviar correo con el link de pago, fuera de la transacción.
+            subject = 'Compra de Tickets - Pago Pendiente'
+            template = 'email/evento_payment_link.html'
+            context = {'venta': venta,
+                       'items': items_venta,
+                       'tickets': tickets_venta,
+                       'protocol': 'https' if self.request.is_secure() else 'http',
+                       'domain': get_current_site(request)}
+            ejecutar_en_segundo_plano(send_email, subject, template, context, venta.email, True)
+            messages.success(request, 'Se ha enviado un correo electrónico con el link de pago.')
             return redirect('venta-ticket-pago', pk=venta.pk)
 
 
@@ -324,9 +314,8 @@ class VentaTicketCheckoutView(View):
                         'domain': get_current_site(request)
                     }
                     send_email(subject, template, context, venta_ticket.email, True)
-                    tickets = venta_ticket.ticket_set.all()
-                    ids = [ticket.id for ticket in tickets]
-                    send_qr_code(ids, venta_ticket.email)
+                    # Los códigos QR se generan y se envían en segundo plano, para no demorar la respuesta al cliente.
+                    ejecutar_en_segundo_plano(enviar_codigos_qr_venta, venta_ticket.pk)
                     messages.success(request, 'El pago se ha realizado correctamente. '
                                               'Se ha enviado un correo de confirmación con los tickets adquiridos.')
                     return redirect('index')
@@ -377,7 +366,7 @@ class VentaTicketUserListView(LoginRequiredMixin, ListView):
     context_object_name = 'ventas'
 
     def get_queryset(self):
-        return VentaTicket.objects.filter(email=self.request.user.email).order_by('-date_created')
+        return VentaTicket.objects.vigentes().filter(email=self.request.user.email).order_by('-date_created')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -444,6 +433,34 @@ class TicketUserDetailView(LoginRequiredMixin, DetailView):
         return context
 
 
+class TicketQRImageView(LoginRequiredMixin, View):
+    """
+    Vista que sirve la imagen del código QR de un ticket desde el almacenamiento. Solo para el comprador del ticket o
+    para el personal con permiso para ver tickets.
+    """
+    FORMATOS = {'svg': 'image/svg+xml', 'png': 'image/png'}
+
+    def get(self, request, *args, **kwargs):
+        formato = self.kwargs['formato']
+        if formato not in self.FORMATOS:
+            raise Http404
+        tickets = Ticket.objects.all()
+        if not request.user.has_perm('eventos.view_ticket'):
+            tickets = tickets.filter(venta_ticket__email=request.user.email, venta_ticket__pagado=True)
+        try:
+            ticket = tickets.get(pk=self.kwargs['pk'])
+        except Ticket.DoesNotExist:
+            raise Http404
+        if not ticket.qr_svg or not ticket.qr_png:
+            ticket.generar_qr()
+        archivo = ticket.qr_png if formato == 'png' else ticket.qr_svg
+        response = FileResponse(archivo.open('rb'), content_type=self.FORMATOS[formato])
+        # La imagen de cada versión del código QR no cambia (las plantillas agregan la versión a la url), se puede
+        # guardar en la caché del navegador.
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return response
+
+
 class EventoUserListView(LoginRequiredMixin, ListView):
     """
     Vista para obtener los eventos de un usuario.
@@ -453,13 +470,13 @@ class EventoUserListView(LoginRequiredMixin, ListView):
     context_object_name = 'eventos'
 
     def get_queryset(self):
-        eventos = []
-        for e in Evento.objects.filter(fecha_inicio__gte=datetime.now().date()).order_by('fecha_inicio'):
-            eventos.append(e) if e.get_start_datetime() > datetime.now() else None
-        return eventos
+        return Evento.objects.proximos()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Eventos'
         context['club_logo'] = Club.objects.get(pk=1).get_imagen()
+        context['eventos_ids'] = list(self.object_list.values_list('pk', flat=True))
+        context['eventos_version'] = get_version_tarjetas()
+        context['eventos_timeout'] = TIMEOUT_TARJETAS
         return context
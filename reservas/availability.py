@@ -0,0 +1,79 @@
+#  Este archivo contiene el motor de disponibilidad de canchas para la app reservas
+
+from datetime import datetime, time, timedelta
+
+from core.parameters import get_parameters
+from reservas.models import Cancha, Reserva, Parameters
+
+
+class GrillaDisponibilidad:
+    """
+    Grilla de ocupación de canchas por día y hora para un deporte.
+
+    La grilla se construye con una consulta de horarios laborales, una de reservas y una de parámetros, sin escribir
+    en la base de datos. Cada celda (fecha, hora) guarda una máscara de bits donde el bit i corresponde a la cancha
+    self.canchas[i].
+    """
+    HORAS = 24
+
+    def __init__(self, deporte_id, fecha_desde, fecha_hasta=None, club_id=1):
+        self.deporte_id = deporte_id
+        self.fecha_desde = fecha_desde
+        self.fecha_hasta = fecha_hasta or fecha_desde
+        parameters = get_parameters(Parameters, club_id)
+        self.horas_anticipacion = parameters.horas_anticipacion
+        self.canchas = []
+        self.laboral = [0] * self.HORAS
+        self.ocupacion = {}
+        self._cargar_horarios()
+        self._cargar_reservas()
+
+    def _cargar_horarios(self):
+        """Carga las canchas del deporte y sus horarios laborales en una sola consulta."""
+        indices = {}
+        for cancha_id, hora in Cancha.objects.filter(deporte_id=self.deporte_id).values_list(
+                'id', 'canchahoralaboral__hora_laboral__hora').order_by('id'):
+            if cancha_id not in indices:
+                indices[cancha_id] = len(self.canchas)
+                self.canchas.append(cancha_id)
+            if hora is not None:
+                self.laboral[hora.hour] |= 1 << indices[cancha_id]
+        self._indices = indices
+        self.todas = (1 << len(self.canchas)) - 1
+
+    def _cargar_reservas(self):
+        """Marca como ocupadas las celdas con reservas vigentes. Las reservas expiradas se consideran libres."""
+        for cancha_id, fecha, hora in Reserva.objects.vigentes().filter(
+                cancha__deporte_id=self.deporte_id,
+                fecha__range=[self.fecha_desde, self.fecha_hasta]).values_list('cancha_id', 'fecha', 'hora'):
+            if cancha_id not in self._indices:
+                continue
+            horas = self.ocupacion.setdefault(fecha, [0] * self.HORAS)
+            horas[hora.hour] |= 1 << self._indices[cancha_id]
+
+    def _libres(self, fecha, hora, solo_horario_laboral=True):
+        """Devuelve la máscara de canchas libres en una fecha y hora."""
+        mascara = self.laboral[hora] if solo_horario_laboral else self.todas
+        return mascara & ~self.ocupacion.get(fecha, [0] * self.HORAS)[hora]
+
+    def _anticipacion_valida(self, fecha, hora):
+        """Devuelve True si la fecha y hora respetan las horas de anticipación del club."""
+        return datetime.combine(fecha, time(hour=hora)) >= datetime.now() + timedelta(hours=self.horas_anticipacion)
+
+    def horas_disponibles(self, fecha, respetar_anticipacion=True):
+        """Devuelve las horas de la fecha en las que hay al menos una cancha disponible."""
+        return [time(hour=hora) for hora in range(self.HORAS)
+                if (not respetar_anticipacion or self._anticipacion_valida(fecha, hora))
+                and self._libres(fecha, hora)]
+
+    def canchas_disponibles(self, fecha, hora, solo_horario_laboral=True):
+        """Devuelve los ids de las canchas disponibles en una fecha y hora."""
+        libres = self._libres(fecha, hora.hour, solo_horario_laboral)
+        return [cancha_id for i, cancha_id in enumerate(self.canchas) if libres >> i & 1]
+
+    def is_available(self, cancha_id, fecha, hora):
+        """Devuelve True si la cancha trabaja en ese horario y no tiene una reserva vigente."""
+        if cancha_id not in self._indices:
+            return False
+        return bool(self._libres(fecha, hora.hour) >> self._indices[cancha_id] & 1)
+
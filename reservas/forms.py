@@ -1,8 +1,13 @@
+from datetime import datetime, timedelta
+
 import mercadopago
 from django import forms
 from django.db import transaction, ProgrammingError, OperationalError
+from simple_history.utils import bulk_create_with_history
 
-from reservas.models import Reserva, HoraLaboral, Deporte, Parameters
+from core.parameters import get_parameters
+from reservas.availability import GrillaDisponibilidad
+from reservas.models import Reserva, HoraLaboral, Deporte, Parameters, Cancha
 from static.credentials import MercadoPagoCredentials
 
 public_key = MercadoPagoCredentials.get_public_key()
@@ -62,6 +67,14 @@ class ReservaAdminForm(forms.ModelForm):
     except (ProgrammingError, OperationalError):
         pass
 
+    def clean(self):
+        cleaned_data = super().clean()
+        # Se da de baja la reserva expirada por falta de pago que ocupe el mismo horario.
+        Reserva.objects.expiradas().filter(cancha=cleaned_data.get('cancha'),
+                                           fecha=cleaned_data.get('fecha'),
+                                           hora=cleaned_data.get('hora')).exclude(pk=self.instance.pk).expirar()
+        return cleaned_data
+
     def save(self, commit=True):
         reserva = super().save(commit=False)
         with transaction.atomic():
@@ -129,6 +142,99 @@ class ReservaAdminForm(forms.ModelForm):
         }
 
 
+class TurnoFijoAdminForm(forms.Form):
+    """
+    Formulario para crear un turno fijo: la misma cancha y hora todas las semanas, durante una cantidad de semanas.
+    Las reservas se validan contra la grilla de disponibilidad en una sola pasada y se crean en lote.
+    """
+    cancha = forms.ModelChoiceField(
+        label='Cancha',
+        queryset=Cancha.objects.all(),
+        widget=forms.Select())
+    hora = forms.ChoiceField(
+        label='Hora',
+        choices=ReservaAdminForm.HORAS,
+        widget=forms.Select())
+    fecha_desde = forms.DateField(
+        label='Primera fecha',
+        help_text='El turno se repite cada semana el mismo día que esta fecha.',
+        widget=forms.DateInput(attrs={'class': 'form-control'}))
+    semanas = forms.IntegerField(
+        label='Cantidad de semanas',
+        min_value=1,
+        max_value=52,
+        initial=4,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}))
+    nombre = forms.CharField(
+        label='Nombre (cliente)',
+        max_length=50,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ingrese el nombre'}))
+    email = forms.EmailField(
+        label='Email (cliente)',
+        widget=forms.EmailInput(attrs={'class': 'form-control', 'placeholder': 'Ingrese el email'}))
+    precio = forms.DecimalField(
+        required=False,
+        label='Precio',
+        help_text='Si no se ingresa un precio, el sistema utilizará el precio definido en la cancha.',
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Ingrese el precio (opcional)'}))
+    con_luz = forms.BooleanField(
+        required=False,
+        label='Con luz',
+        widget=forms.CheckboxInput())
+    omitir_ocupadas = forms.BooleanField(
+        required=False,
+        label='Omitir fechas ocupadas',
+        help_text='Si marca esta opción, se crean las reservas de las fechas libres y se omiten las ocupadas. De lo '
+                  'contrario, no se crea ninguna reserva si alguna fecha está ocupada.',
+        widget=forms.CheckboxInput())
+    nota = forms.CharField(
+        required=False,
+        label='Nota',
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 3,
+                                     'placeholder': 'Ingrese una nota (opcional)'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        cancha = cleaned_data.get('cancha')
+        fecha_desde = cleaned_data.get('fecha_desde')
+        semanas = cleaned_data.get('semanas')
+        if not cancha or not fecha_desde or not semanas or not cleaned_data.get('hora'):
+            return cleaned_data
+        hora = datetime.strptime(cleaned_data['hora'], '%H:%M:%S').time()
+        cleaned_data['hora'] = hora
+        if datetime.combine(fecha_desde, hora) < datetime.now():
+            raise forms.ValidationError('La primera fecha y hora debe ser mayor a la actual.')
+        fechas = [fecha_desde + timedelta(weeks=i) for i in range(semanas)]
+        # Una sola grilla para todo el rango: las reservas expiradas se consideran libres y se dan de baja al guardar.
+        grilla = GrillaDisponibilidad(cancha.deporte_id, fechas[0], fechas[-1], club_id=cancha.club_id)
+        ocupadas = [fecha for fecha in fechas
+                    if cancha.id not in grilla.canchas_disponibles(fecha, hora, solo_horario_laboral=False)]
+        if ocupadas and not cleaned_data.get('omitir_ocupadas'):
+            raise forms.ValidationError('La cancha ya está reservada en las fechas: {}.'.format(
+                ', '.join(fecha.strftime('%d/%m/%Y') for fecha in ocupadas)))
+        cleaned_data['fechas'] = [fecha for fecha in fechas if fecha not in ocupadas]
+        if not cleaned_data['fechas']:
+            raise forms.ValidationError('La cancha está reservada en todas las fechas del turno fijo.')
+        return cleaned_data
+
+    def save(self):
+        """Crea las reservas del turno fijo en una sola transacción. Devuelve la lista de reservas creadas."""
+        data = self.cleaned_data
+        cancha = data['cancha']
+        precio = data['precio']
+        if precio is None:
+            precio = cancha.precio_luz if data['con_luz'] and cancha.precio_luz else cancha.precio
+        with transaction.atomic():
+            # Se dan de baja las reservas expiradas por falta de pago que ocupen alguno de los horarios.
+            Reserva.objects.expiradas().filter(cancha=cancha, fecha__in=data['fechas'], hora=data['hora']).expirar()
+            reservas = [Reserva(cancha=cancha, nombre=data['nombre'], email=data['email'], fecha=fecha,
+                                hora=data['hora'], nota=data['nota'] or None, precio=precio, con_luz=data['con_luz'],
+                                forma_pago=1, expira=False)
+                        for fecha in data['fechas']]
+            bulk_create_with_history(reservas, Reserva, default_change_reason='Turno fijo')
+        return reservas
+
+
 class ReservaIndexForm(forms.Form):
     """Formulario para crear una reserva. Se usa en el index para que el usuario pueda elegir la cancha."""
     try:
@@ -223,8 +329,8 @@ class ReservaUserForm(forms.ModelForm):
 
     def clean(self):
         cleaned_data = self.cleaned_data
-        max_reservas_user = Parameters.objects.get(pk=1).max_reservas_user
-        reservas = Reserva.objects.filter(email=self.data.get('email'))
+        max_reservas_user = get_parameters(Parameters).max_reservas_user
+        reservas = Reserva.objects.vigentes().filter(email=self.data.get('email'))
         count = 0
         for reserva in reservas:
             if not reserva.is_finished():
@@ -234,6 +340,10 @@ class ReservaUserForm(forms.ModelForm):
                 ['El email ingresado ya tiene {} reservas pendientes de pago/activas, '
                  'no puede hacer más.'.format(max_reservas_user)])
             del cleaned_data['email']
+        # Se da de baja la reserva expirada por falta de pago que ocupe el mismo horario.
+        Reserva.objects.expiradas().filter(cancha=cleaned_data.get('cancha'),
+                                           fecha=cleaned_data.get('fecha'),
+                                           hora=cleaned_data.get('hora')).expirar()
         return cleaned_data
 
     class Meta:
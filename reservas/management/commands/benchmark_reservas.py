@@ -0,0 +1,119 @@
+import contextlib
+import io
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from reservas import forms
+from reservas.models import Reserva, CanchaHoraLaboral
+
+DOMINIO = 'benchmark.local'
+
+
+class SdkLocal:
+    """Reemplazo local del SDK de Mercado Pago: crea preferencias sin salir a la red."""
+
+    def preference(self):
+        return self
+
+    def create(self, preference_data):
+        return {'status': 201, 'response': {'id': 'benchmark-{}'.format(uuid.uuid4().hex)}}
+
+
+class Command(BaseCommand):
+    help = 'Crea reservas concurrentes de los mismos horarios a través de ReservaUserCreateView y mide rendimiento, ' \
+           'latencias, errores de bloqueo y conflictos. Usa la base de datos configurada y elimina las reservas ' \
+           'creadas al terminar.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solicitudes', type=int, default=200, help='Cantidad total de solicitudes de reserva.')
+        parser.add_argument('--hilos', type=int, default=20, help='Cantidad de solicitudes simultáneas.')
+        parser.add_argument('--horarios', type=int, default=5,
+                            help='Cantidad de horarios (cancha y hora) que se disputan las solicitudes.')
+        parser.add_argument('--fecha', type=date.fromisoformat, default=None,
+                            help='Fecha de las reservas (AAAA-MM-DD). Por defecto, el próximo sábado.')
+        parser.add_argument('--conservar', action='store_true', help='No eliminar las reservas creadas.')
+
+    def get_horarios(self, cantidad):
+        """Devuelve los primeros horarios laborales (cancha, deporte, hora) de las canchas."""
+        horarios = list(CanchaHoraLaboral.objects.filter(cancha__is_deleted=False).order_by(
+            'cancha_id', 'hora_laboral__hora').values_list('cancha_id', 'cancha__deporte_id', 'hora_laboral__hora')
+                        [:cantidad])
+        if not horarios:
+            raise CommandError('No hay canchas con horarios laborales cargados.')
+        return horarios
+
+    def reservar(self, numero, fecha, horario):
+        """Envía una solicitud de reserva y devuelve (resultado, segundos)."""
+        cancha_id, deporte_id, hora = horario
+        client = Client()
+        inicio = time.perf_counter()
+        try:
+            response = client.post(reverse('reservas-crear'), {
+                'action': 'add',
+                'deporte': deporte_id,
+                'cancha': cancha_id,
+                'fecha': fecha.isoformat(),
+                'hora': hora.strftime('%H:%M:%S'),
+                'nombre': 'Benchmark {}'.format(numero),
+                'email': 'usuario{}@{}'.format(numero, DOMINIO),
+            })
+            data = response.json()
+        finally:
+            connections.close_all()
+        duracion = time.perf_counter() - inicio
+        if 'error' not in data:
+            return 'creada', duracion
+        error = str(data['error'])
+        if 'locked' in error:
+            return 'bloqueo', duracion
+        if 'Ya existe una reserva' in error or 'UNIQUE' in error:
+            return 'conflicto', duracion
+        return 'error', duracion
+
+    def handle(self, *args, **options):
+        fecha = options['fecha'] or date.today() + timedelta(days=(5 - date.today().weekday()) % 7 or 7)
+        horarios = self.get_horarios(options['horarios'])
+        solicitudes = options['solicitudes']
+        Reserva.global_objects.filter(email__endswith='@' + DOMINIO).delete()
+        resultados = []
+        # Se reemplaza Mercado Pago por un SDK local y el correo por el backend en memoria.
+        with mock.patch.object(forms, 'sdk', SdkLocal()), \
+                override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'), \
+                contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['hilos']) as executor:
+                futuros = [executor.submit(self.reservar, i, fecha, horarios[i % len(horarios)])
+                           for i in range(solicitudes)]
+                resultados = [futuro.result() for futuro in futuros]
+            total = time.perf_counter() - inicio
+        creadas = Reserva.objects.filter(email__endswith='@' + DOMINIO, fecha=fecha).count()
+        latencias = sorted(duracion for resultado, duracion in resultados)
+        cantidades = {clave: 0 for clave in ('creada', 'conflicto', 'bloqueo', 'error')}
+        for resultado, duracion in resultados:
+            cantidades[resultado] += 1
+        self.stdout.write('Solicitudes: {} ({} hilos, {} horarios, {})'.format(
+            solicitudes, options['hilos'], len(horarios), fecha.isoformat()))
+        self.stdout.write('Rendimiento: {:.1f} solicitudes/s en {:.2f} s'.format(solicitudes / total, total))
+        self.stdout.write('Latencia p50: {:.1f} ms, p99: {:.1f} ms, máx: {:.1f} ms'.format(
+            latencias[len(latencias) // 2] * 1000, latencias[int(len(latencias) * 0.99)] * 1000,
+            latencias[-1] * 1000))
+        self.stdout.write('Reservas creadas: {}. Conflictos resueltos: {}. Errores de bloqueo: {}. Otros errores: {}.'
+                          .format(cantidades['creada'], cantidades['conflicto'], cantidades['bloqueo'],
+                                  cantidades['error']))
+        if creadas > len(horarios):
+            self.stdout.write(self.style.ERROR('Doble reserva: {} reservas para {} horarios.'.format(
+                creadas, len(horarios))))
+        else:
+            self.stdout.write(self.style.SUCCESS('Sin dobles reservas.'))
+        if not options['conservar']:
+            Reserva.global_objects.filter(email__endswith='@' + DOMINIO).delete()
+            Reserva.history.filter(email__endswith='@' + DOMINIO).delete()
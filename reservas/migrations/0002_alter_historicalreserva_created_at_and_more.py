@@ -0,0 +1,23 @@
+# Generated by Django 4.1.3 on 2026-10-18 08:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historicalreserva',
+            name='created_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, verbose_name='Fecha de creación'),
+        ),
+        migrations.AlterField(
+            model_name='reserva',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Fecha de creación'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0002_alter_historicalreserva_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historicalreserva',
+            name='fecha',
+            field=models.DateField(db_index=True, verbose_name='Fecha'),
+        ),
+        migrations.AlterField(
+            model_name='reserva',
+            name='fecha',
+            field=models.DateField(db_index=True, verbose_name='Fecha'),
+        ),
+    ]
@@ -2,22 +2,22 @@ import uuid
 from datetime import timedelta, datetime
 from smtplib import SMTPException
 
-from PIL import Image
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.mail import EmailMessage
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models, transaction
+from django.db import models
+from django.db.models import Q, OuterRef, Exists, Case, When, Value, BooleanField, CharField
 from django.forms import model_to_dict
 from django.template.loader import render_to_string
 from django.utils import timezone
-from django.utils.encoding import force_bytes
-from django.utils.http import urlsafe_base64_encode
-from django_softdelete.models import SoftDeleteModel
+from django_softdelete.models import SoftDeleteModel, SoftDeleteQuerySet
 from simple_history.models import HistoricalRecords
+from simple_history.utils import bulk_update_with_history
 
-from accounts.models import User
-from reservas.tokens import reserva_create_token
+from core.images import registrar_imagen, get_imagen_url
+from core.parameters import get_parameters
+from core.tasks import ejecutar_en_segundo_plano
 
 
 class Parameters(models.Model):
@@ -65,6 +65,64 @@ class Parameters(models.Model):
         verbose_name_plural = 'Parámetros de reservas'
 
 
+class ReservaQuerySet(SoftDeleteQuerySet):
+    """
+    QuerySet de las reservas.
+    """
+
+    def expiradas(self, club_id=1):
+        """Reservas que expiran y no fueron pagadas dentro de los minutos de expiración."""
+        minutos = get_parameters(Parameters, club_id).minutos_expiracion_reserva
+        return self.filter(expira=True, pagado=False, created_at__lt=timezone.now() - timedelta(minutes=minutos))
+
+    def vigentes(self, club_id=1):
+        """Reservas que no expiraron por falta de pago."""
+        minutos = get_parameters(Parameters, club_id).minutos_expiracion_reserva
+        return self.exclude(expira=True, pagado=False, created_at__lt=timezone.now() - timedelta(minutes=minutos))
+
+    def with_estado(self, club_id=1):
+        """
+        Anota en cada reserva si comenzó (en_curso), si finalizó (finalizada), su estado y su estado de pago, con los
+        mismos criterios que get_ESTADO_display y get_ESTADO_PAGO_display, para listarlas sin consultas por fila.
+        """
+        ahora = datetime.now()
+        fin = ahora - timedelta(hours=1)
+        comenzada = Q(fecha__lt=ahora.date()) | Q(fecha=ahora.date(), hora__lt=ahora.time())
+        terminada = Q(fecha__lt=fin.date()) | Q(fecha=fin.date(), hora__lt=fin.time())
+        finalizada = comenzada if get_parameters(Parameters, club_id).finalizar_al_comenzar else terminada
+        pago_aprobado = PagoReserva.objects.filter(reserva=OuterRef('pk'), status='approved')
+        return self.select_related('cancha__deporte', 'pagoreserva').annotate(
+            en_curso=Case(When(comenzada, then=Value(True)), default=Value(False), output_field=BooleanField()),
+            finalizada=Case(When(finalizada, then=Value(True)), default=Value(False), output_field=BooleanField()),
+        ).annotate(
+            estado=Case(
+                When(finalizada=True, asistencia=True, then=Value('Completada')),
+                When(finalizada=True, then=Value('Asistencia pendiente')),
+                When(en_curso=True, then=Value('En curso')),
+                default=Value('Pendiente'), output_field=CharField()),
+            estado_pago=Case(
+                When(forma_pago=1, asistencia=True, then=Value('Aprobado')),
+                When(Exists(pago_aprobado), then=Value('Aprobado')),
+                default=Value('Pendiente'), output_field=CharField()),
+        )
+
+    def expirar(self):
+        """Da de baja en lote las reservas del queryset, registrando el motivo en el historial."""
+        reservas = list(self.filter(is_deleted=False))
+        deleted_at = timezone.now()
+        for reserva in reservas:
+            reserva.is_deleted = True
+            reserva.deleted_at = deleted_at
+        bulk_update_with_history(reservas, Reserva, ['is_deleted', 'deleted_at'],
+                                 default_change_reason='Expirada por falta de pago')
+        return len(reservas)
+
+
+class ReservaManager(models.Manager.from_queryset(ReservaQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class Reserva(SoftDeleteModel):
     """
     Modelo de la reserva.
@@ -77,7 +135,7 @@ class Reserva(SoftDeleteModel):
     cancha = models.ForeignKey('reservas.Cancha', on_delete=models.PROTECT)
     nombre = models.CharField(max_length=50, verbose_name='Nombre (cliente)')
     email = models.EmailField(verbose_name='Email (cliente)')
-    fecha = models.DateField(verbose_name='Fecha')
+    fecha = models.DateField(db_index=True, verbose_name='Fecha')
     hora = models.TimeField(verbose_name='Hora')
     nota = models.TextField(null=True, blank=True, verbose_name='Nota')
     # Campos para el administrador.
@@ -91,16 +149,18 @@ class Reserva(SoftDeleteModel):
                                      help_text='ID de la preferencia de pago de Mercado Pago')
     asistencia = models.BooleanField(default=False, verbose_name='Asistencia', help_text='Asistencia del cliente')
     # Campos para el historial.
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Fecha de creación')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')
     history = HistoricalRecords()
 
+    objects = ReservaManager()
+
     def __str__(self):
         return 'Reserva de cancha #{} - {} - {}'.format(self.cancha.id, self.fecha, self.hora)
 
     def is_finished(self):
         """Método para saber si la reserva ya finalizó."""
-        if Parameters.objects.get(club=self.cancha.club).finalizar_al_comenzar:
+        if get_parameters(Parameters, self.cancha.club_id).finalizar_al_comenzar:
             return self.start_datetime() < datetime.now().isoformat()
         return self.end_datetime() < datetime.now().isoformat()
 
@@ -128,7 +188,7 @@ class Reserva(SoftDeleteModel):
 
     def get_expiration_date(self, isoformat=True):
         """Método para obtener la fecha de expiración de la reserva, en caso de que la forma de pago sea online."""
-        minutos = Parameters.objects.get(club=self.cancha.club).minutos_expiracion_reserva
+        minutos = get_parameters(Parameters, self.cancha.club_id).minutos_expiracion_reserva
         if self.expira:
             return (self.created_at + timedelta(
                 minutes=minutos)).isoformat() if isoformat else self.created_at + timedelta(
@@ -206,48 +266,33 @@ class Reserva(SoftDeleteModel):
         item['cancha_imagen'] = self.cancha.get_imagen()
         return item
 
+    def is_expired(self):
+        """Método para saber si la reserva expiró por falta de pago."""
+        return bool(self.created_at) and self.expira and not self.pagado and \
+            self.get_expiration_date(isoformat=False) < timezone.now()
+
     def clean(self):
         """Método clean() sobrescrito para validar la reserva."""
         super(Reserva, self).clean()
-        # Si pasó la fecha de expiración de la reserva y no se ha pagado, se cancela.
-        if self.created_at:
-            if self.expira and self.get_expiration_date(isoformat=False) < timezone.now() and not self.pagado:
-                print('La reserva #{} ha expirado por falta de pago'.format(self.id))
-                with transaction.atomic():
-                    self.delete()
-                raise ValidationError('La {} ha expirado por falta de pago.'.format(self.__str__()),
-                                      code='invalid', params={'id': self.id})
+        # Si pasó la fecha de expiración de la reserva y no se ha pagado, no es válida. La baja la realiza el
+        # comando expirar_pendientes.
+        if self.is_expired():
+            raise ValidationError('La {} ha expirado por falta de pago.'.format(self.__str__()),
+                                  code='invalid', params={'id': self.id})
 
     def after_delete(self):
         """Método after_delete() sobrescrito para eliminar la preferencia de pago de Mercado Pago."""
         # TODO: Agregar la opción de descuento.
-        horas_avisar_cancha_libre = Parameters.objects.get(pk=1).horas_avisar_cancha_libre
-        horas_anticipacion = Parameters.objects.get(pk=1).horas_anticipacion
-        if not self.is_finished() and self.pagado and datetime.combine(self.fecha, self.hora) - timedelta(
-                hours=horas_avisar_cancha_libre) < datetime.now() + timedelta(hours=horas_anticipacion):
+        parameters = get_parameters(Parameters)
+        horas_avisar_cancha_libre = parameters.horas_avisar_cancha_libre
+        horas_anticipacion = parameters.horas_anticipacion
+        if parameters.avisar_cancha_libre and not self.is_finished() and self.pagado and datetime.combine(
+                self.fecha, self.hora) - timedelta(hours=horas_avisar_cancha_libre) < datetime.now() + timedelta(
+                hours=horas_anticipacion):
             print('La reserva #{} se ha cancelado a pocas horas de comenzar'.format(self.id))
-            with transaction.atomic():
-                for user in User.objects.filter(is_active=True, notificaciones=True, is_staff=False,
-                                                is_superuser=False).exclude(email=self.email):
-                    subject = 'Cancha liberada'
-                    template = 'email/cancha_liberada.html'
-                    context = {
-                        'user': user,
-                        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
-                        'token': reserva_create_token.make_token(user),
-                        'reserva': self,
-                        'protocol': 'http' if settings.DEBUG else 'https',
-                        'domain': '127.0.0.1:8000/'
-                    }
-                    message = render_to_string(template, context)
-                    email = EmailMessage(
-                        subject,
-                        message,
-                        settings.DEFAULT_FROM_EMAIL,
-                        [user.email],
-                    )
-                    email.content_subtype = 'html'
-                    email.send(fail_silently=True)
+            # El aviso a los usuarios interesados se envía en segundo plano, luego de confirmar la baja.
+            from reservas.notifications import notificar_cancha_liberada
+            ejecutar_en_segundo_plano(notificar_cancha_liberada, self.pk)
 
     class Meta:
         verbose_name = 'Reserva'
@@ -347,27 +392,15 @@ class Cancha(SoftDeleteModel):
         return 'Cancha #{}'.format(self.id)
 
     def save(self, *args, **kwargs):
-        """Método save() sobrescrito para redimensionar la imagen."""
+        """Método save() sobrescrito para redimensionar la imagen y registrar sus datos."""
         super().save(*args, **kwargs)
-        try:
-            img = Image.open(self.imagen.path)
-            if img.height > 300 or img.width > 300:
-                output_size = (300, 300)
-                img.thumbnail(output_size)
-                img.save(self.imagen.path)
-        except (FileNotFoundError, ValueError):
-            pass
+        registrar_imagen(self.imagen, 300)
 
     def get_imagen(self):
         """
         Devuelve la imagen de la cancha.
         """
-        try:
-            # Si existe una imagen en self.imagen.url, la devuelve.
-            Image.open(self.imagen.path)
-            return self.imagen.url
-        except (FileNotFoundError, ValueError):
-            return settings.STATIC_URL + 'img/empty.svg'
+        return get_imagen_url(self.imagen)
 
     class Meta:
         verbose_name = 'Cancha'
@@ -394,15 +427,8 @@ class Cancha(SoftDeleteModel):
         if not hora_laboral:
             return False
 
-        # Se obtienen las reservas de la cancha para la fecha y hora.
-        try:
-            reserva = self.reserva_set.get(fecha=fecha, hora=hora_inicio, is_deleted=False)
-            reserva.clean()
-        except (Reserva.DoesNotExist, ValidationError):
-            return True
-
-        if reserva:
-            return False
+        # Se verifica que la cancha no tenga reservas vigentes para la fecha y hora.
+        return not self.reserva_set.vigentes().filter(fecha=fecha, hora=hora_inicio).exists()
 
 
 class CanchaHoraLaboral(models.Model):
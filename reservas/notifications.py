@@ -0,0 +1,54 @@
+#  Este archivo contiene el envío de avisos de canchas liberadas para la app reservas
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from accounts.models import User
+from reservas.models import Reserva
+from reservas.tokens import reserva_create_token
+
+TAMANO_LOTE = 50
+
+
+def get_destinatarios(reserva):
+    """
+    Devuelve los usuarios a los que les interesa la cancha liberada: con notificaciones activas, que eligieron el
+    deporte de la cancha (o ninguno) y cuyo horario de interés incluye la hora de la reserva.
+    """
+    return User.objects.filter(
+        Q(deportes_notificacion=None) | Q(deportes_notificacion=reserva.cancha.deporte_id),
+        Q(hora_desde_notificacion=None) | Q(hora_desde_notificacion__lte=reserva.hora),
+        Q(hora_hasta_notificacion=None) | Q(hora_hasta_notificacion__gte=reserva.hora),
+        is_active=True, notificaciones=True, is_staff=False, is_superuser=False,
+    ).exclude(email=reserva.email).distinct()
+
+
+def notificar_cancha_liberada(reserva_id):
+    """
+    Envía el aviso de cancha liberada a los usuarios interesados, en lotes y reutilizando una sola conexión SMTP.
+    """
+    reserva = Reserva.global_objects.select_related('cancha__club', 'cancha__deporte').get(pk=reserva_id)
+    subject = 'Cancha liberada'
+    template = 'email/cancha_liberada.html'
+    mensajes = []
+    for user in get_destinatarios(reserva):
+        context = {
+            'user': user,
+            'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+            'token': reserva_create_token.make_token(user),
+            'reserva': reserva,
+            'protocol': 'http' if settings.DEBUG else 'https',
+            'domain': '127.0.0.1:8000/'
+        }
+        email = EmailMessage(subject, render_to_string(template, context), settings.DEFAULT_FROM_EMAIL, [user.email])
+        email.content_subtype = 'html'
+        mensajes.append(email)
+    connection = get_connection(fail_silently=True)
+    with connection:
+        for i in range(0, len(mensajes), TAMANO_LOTE):
+            connection.send_messages(mensajes[i:i + TAMANO_LOTE])
+    print('Aviso de cancha liberada de la reserva #{} enviado a {} usuarios'.format(reserva_id, len(mensajes)))
@@ -2,7 +2,8 @@ from django.shortcuts import redirect
 from django.urls import path
 
 from reservas.views.admin.reserva.views import ReservaAdminListView, ReservaAdminCreateView, ReservaAdminDetailView, \
-    ReservaAdminUpdateView, ReservaAdminDeleteView, reserva_admin_ajax
+    ReservaAdminUpdateView, ReservaAdminDeleteView, ReservaAdminCalendarView, ReservaAdminTurnoFijoView, \
+    reserva_admin_ajax
 from reservas.views.user.reserva.views import ReservaUserListView, ReservaUserCreateView, ReservaUserDetailView, \
     ReservaUserDeleteView, ReservaUserPaymentView, ReservaCheckoutView, ReservaUserReceiptView, \
     reserva_liberada_activate, reserva_user_ajax
@@ -13,10 +14,12 @@ urlpatterns = [
     path('admin/reservas/', lambda request: redirect('admin-reservas-listado', permanent=True), name='admin-reservas'),
     path('admin/reservas/listado/', ReservaAdminListView.as_view(), name='admin-reservas-listado'),
     path('admin/reservas/crear/', ReservaAdminCreateView.as_view(), name='admin-reservas-crear'),
+    path('admin/reservas/turno-fijo/', ReservaAdminTurnoFijoView.as_view(), name='admin-reservas-turno-fijo'),
     path('admin/reservas/<uuid:pk>/', ReservaAdminDetailView.as_view(), name='admin-reservas-detalle'),
     path('admin/reservas/<uuid:pk>/editar/', ReservaAdminUpdateView.as_view(), name='admin-reservas-editar'),
     path('admin/reservas/<uuid:pk>/baja/', ReservaAdminDeleteView.as_view(), name='admin-reservas-baja'),
     path('admin/reservas/ajax/', reserva_admin_ajax, name='admin-reservas-ajax'),
+    path('admin/reservas/calendario/', ReservaAdminCalendarView.as_view(), name='admin-reservas-calendario'),
 
     # URLs de las reservas (usuarios)
     path('reservas/', lambda request: redirect('reservas-listado', permanent=True), name='reservas'),
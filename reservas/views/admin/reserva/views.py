@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta
 
 from django.conf import settings
 from django.contrib import messages
@@ -8,13 +8,17 @@ from django.core.mail import send_mail
 from django.db import transaction
 from django.http import JsonResponse
 from django.shortcuts import redirect
-from django.views.generic import ListView, CreateView, UpdateView, DetailView, DeleteView
+from django.urls import reverse
+from django.views import View
+from django.views.generic import ListView, CreateView, UpdateView, DetailView, DeleteView, FormView
 
-from reservas.forms import ReservaAdminForm
-from reservas.models import Reserva, PagoReserva, Cancha, Parameters
+from config.mixins import DataTableMixin
+from reservas.availability import GrillaDisponibilidad
+from reservas.forms import ReservaAdminForm, TurnoFijoAdminForm
+from reservas.models import Reserva, PagoReserva
 
 
-class ReservaAdminListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class ReservaAdminListView(LoginRequiredMixin, PermissionRequiredMixin, DataTableMixin, ListView):
     """
     Vista para listar las reservas.
     """
@@ -22,9 +26,26 @@ class ReservaAdminListView(LoginRequiredMixin, PermissionRequiredMixin, ListView
     template_name = 'admin/reserva/list.html'
     context_object_name = 'reservas'
     permission_required = 'core.view_reserva'
+    datatable_values = ['id', 'fecha', 'hora', 'cancha_id', 'nombre', 'estado_pago', 'estado']
+    datatable_search_fields = ['nombre', 'email', 'cancha__id']
+    datatable_order_fields = {
+        'fecha_hora': ['fecha', 'hora'],
+        'cancha': 'cancha_id',
+        'nombre': 'nombre',
+        'estado_pago': 'estado_pago',
+        'estado': 'estado',
+    }
+    datatable_default_order = ['-fecha', '-hora']
 
     def get_queryset(self):
-        return Reserva.objects.all().order_by('-created_at')
+        return Reserva.objects.with_estado().order_by('-created_at')
+
+    def get_datatable_row(self, row):
+        row['id'] = str(row['id'])
+        row['fecha_hora'] = datetime.combine(row.pop('fecha'), row.pop('hora')).strftime('%d/%m/%Y %H:%M')
+        row['cancha'] = 'Cancha #{}'.format(row.pop('cancha_id'))
+        row['url_detalle'] = reverse('admin-reservas-detalle', args=[row['id']])
+        return row
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -32,6 +53,38 @@ class ReservaAdminListView(LoginRequiredMixin, PermissionRequiredMixin, ListView
         return context
 
 
+class ReservaAdminCalendarView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """
+    Vista que devuelve los eventos del calendario de reservas, solo para el rango de fechas visible (parámetros start
+    y end que envía FullCalendar).
+    """
+    permission_required = 'core.view_reserva'
+
+    def get(self, request, *args, **kwargs):
+        data = []
+        try:
+            start = datetime.strptime(request.GET['start'][:10], '%Y-%m-%d').date()
+            end = datetime.strptime(request.GET['end'][:10], '%Y-%m-%d').date()
+            ahora = datetime.now()
+            for reserva_id, cancha_id, nombre, fecha, hora, asistencia in Reserva.objects.filter(
+                    fecha__range=[start, end]).values_list('id', 'cancha_id', 'nombre', 'fecha', 'hora', 'asistencia'):
+                inicio = datetime.combine(fecha, hora)
+                fin = inicio + timedelta(hours=1)
+                evento = {
+                    'title': 'Cancha #{} - {}'.format(cancha_id, nombre),
+                    'start': inicio.isoformat(),
+                    'end': fin.isoformat(),
+                    'url': reverse('admin-reservas-detalle', args=[reserva_id]),
+                    'color': '#8496a9' if fin < ahora else '#0275d8',
+                }
+                if asistencia:
+                    evento['borderColor'] = '#5cb85c'
+                data.append(evento)
+        except Exception as e:
+            data = {'error': e.args[0]}
+        return JsonResponse(data, safe=False)
+
+
 class ReservaAdminCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
     """
     Vista para crear una reserva.
@@ -66,6 +119,40 @@ class ReservaAdminCreateView(LoginRequiredMixin, PermissionRequiredMixin, Create
         return JsonResponse(data, safe=False)
 
 
+class ReservaAdminTurnoFijoView(LoginRequiredMixin, PermissionRequiredMixin, FormView):
+    """
+    Vista para crear un turno fijo (reservas semanales de la misma cancha y hora) en una sola operación.
+    """
+    template_name = 'admin/reserva/turno_fijo.html'
+    form_class = TurnoFijoAdminForm
+    permission_required = 'core.add_reserva'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = 'Crear Turno Fijo'
+        context['action'] = 'add'
+        return context
+
+    def post(self, request, *args, **kwargs):
+        data = {}
+        try:
+            action = request.POST['action']
+            if action == 'add':
+                form = self.form_class(request.POST)
+                if form.is_valid():
+                    reservas = form.save()
+                    data['cantidad'] = len(reservas)
+                    data['omitidas'] = form.cleaned_data['semanas'] - len(reservas)
+                else:
+                    data['error'] = form.errors
+            else:
+                data['error'] = 'No ha ingresado a ninguna opción'
+        except Exception as e:
+            data['error'] = e.args[0]
+        print('ReservaAdminTurnoFijoView: ', data)
+        return JsonResponse(data, safe=False)
+
+
 class ReservaAdminDetailView(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
     """
     Vista para mostrar los detalles de una reserva.
@@ -75,6 +162,9 @@ class ReservaAdminDetailView(LoginRequiredMixin, PermissionRequiredMixin, Detail
     context_object_name = 'reserva'
     permission_required = 'core.view_reserva'
 
+    def get_queryset(self):
+        return Reserva.objects.with_estado()
+
     def dispatch(self, request, *args, **kwargs):
         reserva = self.get_object()
         try:
@@ -186,48 +276,28 @@ def reserva_admin_ajax(request):
                 fecha = datetime.strptime(fecha, '%Y-%m-%d').date()
                 hora = datetime.strptime(hora, '%H:%M:%S').time()
                 start_date = datetime.combine(fecha, hora)
+                grilla = GrillaDisponibilidad(deporte_id, fecha)
                 # Fecha de inicio de la reserva debe ser con al menos 2 horas de anticipación
-                horas_anticipacion = Parameters.objects.get(club_id=1).horas_anticipacion
+                horas_anticipacion = grilla.horas_anticipacion
                 if request.user.is_authenticated and request.user.is_admin():
-                    canchas_disp = Cancha.objects.filter(deporte_id=deporte_id)
+                    canchas_disp = grilla.canchas_disponibles(fecha, hora, solo_horario_laboral=False)
                 else:
                     if start_date < datetime.now() + timedelta(hours=horas_anticipacion):
                         data['error'] = 'El inicio de la reserva debe ser con al menos {} horas de ' \
                                         'anticipación.'.format(horas_anticipacion)
                         return JsonResponse(data, safe=False)
                     # Excluir las canchas que tengan reservas en esa hora y fecha y no estén eliminadas
-                    canchas_disp = Cancha.objects.filter(deporte_id=deporte_id, hora_laboral__hora=hora)
-                for reserva in Reserva.global_objects.filter(cancha__deporte_id=deporte_id,
-                                                             hora=hora,
-                                                             fecha=fecha,
-                                                             is_deleted=False):
-                    try:
-                        reserva.clean()
-                        canchas_disp = canchas_disp.exclude(id=reserva.cancha.id)
-                    except ValidationError:
-                        pass
+                    canchas_disp = grilla.canchas_disponibles(fecha, hora)
                 if canchas_disp:
-                    data['canchas'] = list(canchas_disp.values_list('id'))
+                    data['canchas'] = [[cancha_id] for cancha_id in canchas_disp]
                 else:
                     data['error'] = 'No hay canchas disponibles para la fecha y hora seleccionada.'
             elif action == 'search_horas_disponibles':
                 deporte_id = request.GET['deporte_id']
                 fecha = request.GET['fecha']
-                fecha = datetime.strptime(fecha, '%Y-%m-%d')
-                horas_anticipacion = Parameters.objects.get(club_id=1).horas_anticipacion
-                horas_disponibles = []
-                for i in range(24):
-                    hora = datetime.combine(fecha, time(hour=i))
-                    if hora < datetime.now() + timedelta(hours=horas_anticipacion):
-                        continue
-                    if hora.date() > fecha.date():
-                        break
-                    canchas_disp = Cancha.objects.filter(deporte_id=deporte_id, hora_laboral__hora=hora.time()).exclude(
-                        reserva__hora=hora,
-                        reserva__fecha=fecha,
-                        reserva__is_deleted=False)
-                    if canchas_disp:
-                        horas_disponibles.append(hora.strftime('%H:%M:%S'))
+                fecha = datetime.strptime(fecha, '%Y-%m-%d').date()
+                grilla = GrillaDisponibilidad(deporte_id, fecha)
+                horas_disponibles = [hora.strftime('%H:%M:%S') for hora in grilla.horas_disponibles(fecha)]
                 if horas_disponibles:
                     data['horas_disponibles'] = horas_disponibles
                 else:
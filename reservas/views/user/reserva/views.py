@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta
 
 import mercadopago
 from django.contrib import messages
@@ -18,8 +18,9 @@ from num2words import num2words
 from accounts.views import User
 from core.models import Club
 from core.utilities import send_email
+from reservas.availability import GrillaDisponibilidad
 from reservas.forms import ReservaUserForm
-from reservas.models import Reserva, PagoReserva, Cancha, HoraLaboral, Parameters
+from reservas.models import Reserva, PagoReserva, Cancha, HoraLaboral
 from reservas.tokens import reserva_create_token
 from static.credentials import MercadoPagoCredentials  # Aquí debería insertar sus credenciales de MercadoPago
 
@@ -102,7 +103,7 @@ class ReservaUserListView(LoginRequiredMixin, ListView):
     context_object_name = 'reservas'
 
     def get_queryset(self):
-        return Reserva.objects.filter(email=self.request.user.email)
+        return Reserva.objects.vigentes().with_estado().filter(email=self.request.user.email)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -119,6 +120,9 @@ class ReservaUserDetailView(LoginRequiredMixin, DetailView):
     template_name = 'user/reserva/detail.html'
     context_object_name = 'reserva'
 
+    def get_queryset(self):
+        return Reserva.objects.with_estado()
+
     def dispatch(self, request, *args, **kwargs):
         if not request.user.is_anonymous:
             reserva = self.get_object()
@@ -137,7 +141,7 @@ class ReservaUserDetailView(LoginRequiredMixin, DetailView):
         context['title'] = 'Detalle de Reserva'
         context['club_logo'] = Club.objects.get(pk=1).get_imagen()
         try:
-            context['pago_reserva'] = self.get_object().pagoreserva
+            context['pago_reserva'] = self.object.pagoreserva
         except PagoReserva.DoesNotExist:
             pass
         return context
@@ -317,6 +321,7 @@ def reserva_liberada_activate(request, uidb64, token):
             cancha = Cancha.objects.get(pk=request.GET['cancha_pk'])
             fecha = datetime.strptime(request.GET['fecha'], '%Y-%m-%d').date()
             hora = datetime.strptime(request.GET['hora'], '%H:%M').time()
+            Reserva.objects.expiradas().filter(cancha=cancha, fecha=fecha, hora=hora).expirar()
             if not cancha.is_available(fecha, hora):
                 messages.error(request, 'La cancha ya no se encuentra disponible.')
                 return redirect('index')
@@ -387,46 +392,25 @@ def reserva_user_ajax(request):
                     fecha = datetime.strptime(fecha, '%Y-%m-%d').date()
                     hora = datetime.strptime(hora, '%H:%M:%S').time()
                     start_date = datetime.combine(fecha, hora)
+                    grilla = GrillaDisponibilidad(deporte_id, fecha)
                     # Fecha de inicio de la reserva debe ser con al menos 2 horas de anticipación
-                    horas_anticipacion = Parameters.objects.get(club_id=1).horas_anticipacion
+                    horas_anticipacion = grilla.horas_anticipacion
                     if start_date < datetime.now() + timedelta(hours=horas_anticipacion):
                         data['error'] = 'Es necesario realizar la reserva con al menos {} horas de anticipación antes' \
                                         ' del inicio.'.format(horas_anticipacion)
                         return JsonResponse(data, safe=False)
                     # Excluir las canchas que tengan reservas en esa hora y fecha y no estén eliminadas
-                    canchas_disp = Cancha.objects.filter(deporte_id=deporte_id, hora_laboral__hora=hora)
-                    for reserva in Reserva.global_objects.filter(cancha__deporte_id=deporte_id,
-                                                                 hora=hora,
-                                                                 fecha=fecha,
-                                                                 is_deleted=False):
-                        try:
-                            reserva.clean()
-                            canchas_disp = canchas_disp.exclude(id=reserva.cancha.id)
-                        except ValidationError:
-                            pass
+                    canchas_disp = grilla.canchas_disponibles(fecha, hora)
                     if canchas_disp:
-                        data['canchas'] = list(canchas_disp.values_list('id'))
+                        data['canchas'] = [[cancha_id] for cancha_id in canchas_disp]
                     else:
                         data['error'] = 'No hay canchas disponibles para la fecha y hora seleccionada.'
                 elif action == 'search_horas_disponibles':
                     deporte_id = request.GET['deporte_id']
                     fecha = request.GET['fecha']
-                    fecha = datetime.strptime(fecha, '%Y-%m-%d')
-                    horas_anticipacion = Parameters.objects.get(club_id=1).horas_anticipacion
-                    horas_disponibles = []
-                    for i in range(24):
-                        hora = datetime.combine(fecha, time(hour=i))
-                        if hora < datetime.now() + timedelta(hours=horas_anticipacion):
-                            continue
-                        if hora.date() > fecha.date():
-                            break
-                        canchas_disp = Cancha.objects.filter(deporte_id=deporte_id,
-                                                             hora_laboral__hora=hora.time()).exclude(
-                            reserva__hora=hora,
-                            reserva__fecha=fecha,
-                            reserva__is_deleted=False)
-                        if canchas_disp:
-                            horas_disponibles.append(hora.strftime('%H:%M:%S'))
+                    fecha = datetime.strptime(fecha, '%Y-%m-%d').date()
+                    grilla = GrillaDisponibilidad(deporte_id, fecha)
+                    horas_disponibles = [hora.strftime('%H:%M:%S') for hora in grilla.horas_disponibles(fecha)]
                     if horas_disponibles:
                         data['horas_disponibles'] = horas_disponibles
                     else:
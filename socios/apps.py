@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class SociosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'socios'
+
+    def ready(self):
+        from socios.categories import conectar_categorias
+        conectar_categorias()
+        import socios.signals
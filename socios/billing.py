@@ -0,0 +1,96 @@
+#  Este archivo contiene la generación de las cuotas sociales de un periodo para la app socios
+
+from datetime import datetime
+
+from django.db import transaction
+from django.utils import timezone
+from simple_history.utils import bulk_create_with_history
+
+from core.models import Persona
+from socios.categories import get_categorias_nacimiento
+from socios.families import cargar_grupos_familiares
+from socios.models import CuotaSocial, ItemCuotaSocial
+
+
+def get_inicio_periodo(periodo_mes, periodo_anio):
+    """Devuelve el inicio del periodo: solo se facturan los socios dados de alta hasta esa fecha."""
+    return timezone.make_aware(datetime(int(periodo_anio), int(periodo_mes), 1))
+
+
+def get_cuotas_periodo(periodo_mes, periodo_anio, personas=None):
+    """
+    Calcula las cuotas sociales del periodo con tres consultas: una para las personas titulares sin cuota en el periodo
+    (opcionalmente solo las indicadas) y dos para sus grupos familiares (ver socios.families). Las categorías se
+    resuelven en lote con la caché de categorías.
+
+    Devuelve un diccionario {persona_id: (persona, items)} con las personas titulares que cumplen los requisitos, donde
+    cada item es un diccionario con el socio, el nombre completo, la categoría y la cuota:
+    - Si el titular no es socio, se facturan los miembros socios dados de alta hasta el inicio del periodo.
+    - Si el titular es socio y no tiene miembros socios, se factura si fue dado de alta hasta el inicio del periodo.
+    - Si el titular es socio y tiene miembros socios, se factura todo el grupo familiar si alguno de ellos fue dado de
+      alta hasta el inicio del periodo.
+    """
+    inicio = get_inicio_periodo(periodo_mes, periodo_anio)
+    titulares = Persona.objects.filter(persona_titular__isnull=True).exclude(
+        pk__in=CuotaSocial.global_objects.filter(periodo_mes=periodo_mes, periodo_anio=periodo_anio).values(
+            'persona_id'))
+    if personas is not None:
+        titulares = titulares.filter(pk__in=personas)
+    titulares = list(titulares.order_by('pk'))
+    cargar_grupos_familiares(titulares)
+    grupos = []
+    for persona in titulares:
+        socio = persona.get_socio()
+        grupo = persona._grupo_familiar.get_socios_miembros()
+        if socio is None:
+            grupo = [miembro for miembro in grupo if miembro.date_created <= inicio]
+        elif any(miembro.date_created <= inicio for miembro in [socio] + grupo):
+            grupo = [socio] + grupo
+        else:
+            grupo = []
+        if grupo:
+            grupos.append((persona, grupo))
+    categorias = iter(get_categorias_nacimiento(
+        [miembro.persona.fecha_nacimiento for persona, grupo in grupos for miembro in grupo]))
+    cuotas = {}
+    for persona, grupo in grupos:
+        items = []
+        for miembro, categoria in zip(grupo, categorias):
+            items.append({
+                'socio': miembro,
+                'nombre_completo': miembro.persona.get_full_name(),
+                'categoria': categoria,
+                'cuota': categoria.cuota,
+            })
+        cuotas[persona.pk] = (persona, items)
+    return cuotas
+
+
+def generar_cuotas_periodo(periodo_mes, periodo_anio, fecha_vencimiento, personas=None):
+    """
+    Genera en lote las cuotas sociales del periodo de las personas indicadas que cumplen los requisitos: las cuotas,
+    sus items y sus registros de historial se insertan con bulk_create en una sola transacción. Devuelve la cantidad
+    de cuotas generadas.
+    """
+    with transaction.atomic():
+        cuotas_periodo = get_cuotas_periodo(periodo_mes, periodo_anio, personas)
+        fecha_emision = timezone.now()
+        cuotas = bulk_create_with_history([
+            CuotaSocial(
+                persona=persona,
+                fecha_emision=fecha_emision,
+                fecha_vencimiento=fecha_vencimiento,
+                periodo_mes=periodo_mes,
+                periodo_anio=periodo_anio,
+                total=sum(item['cuota'] for item in items),
+            ) for persona, items in cuotas_periodo.values()], CuotaSocial)
+        bulk_create_with_history([
+            ItemCuotaSocial(
+                cuota_social=cuota,
+                socio=item['socio'],
+                nombre_completo=item['nombre_completo'],
+                categoria=str(item['categoria']),
+                cuota=item['cuota'],
+                total_parcial=item['cuota'],
+            ) for cuota, (persona, items) in zip(cuotas, cuotas_periodo.values()) for item in items], ItemCuotaSocial)
+    return len(cuotas)
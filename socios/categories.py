@@ -0,0 +1,115 @@
+#  Este archivo contiene la caché de las categorías de los socios y la búsqueda de la categoría según la edad
+
+import uuid
+from bisect import bisect_right
+from datetime import date
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+
+CLAVE_VERSION = 'socios:categorias:version'
+
+# Resolutor cargado en este proceso: (version, resolutor)
+_resolutor = None
+
+
+class ResolutorCategorias:
+    """
+    Busca la categoría de una edad en los rangos de edad de las categorías, ordenados y sin superponerse, con búsqueda
+    binaria. Respeta el criterio de Socio.get_categoria(): las categorías se recorren por edad mínima, gana la primera
+    cuyo rango contiene la edad, y la última categoría cargada (la de mayor id) corta el recorrido y es la categoría
+    por defecto de las edades que no entran en ningún rango.
+    """
+
+    def __init__(self, categorias):
+        categorias = sorted(categorias, key=lambda categoria: (categoria.edad_minima, categoria.pk))
+        self.ultima = max(categorias, key=lambda categoria: categoria.pk, default=None)
+        self.inicios = []
+        self.fines = []
+        self.categorias = []
+        fin_anterior = -1
+        for categoria in categorias:
+            # Cada categoría se queda con la parte de su rango que no cubren las anteriores.
+            inicio = max(categoria.edad_minima, fin_anterior + 1)
+            if inicio <= categoria.edad_maxima:
+                self.inicios.append(inicio)
+                self.fines.append(categoria.edad_maxima)
+                self.categorias.append(categoria)
+            fin_anterior = max(fin_anterior, categoria.edad_maxima)
+            if categoria == self.ultima:
+                break
+
+    def get_categoria(self, edad):
+        """Devuelve la categoría de la edad indicada."""
+        i = bisect_right(self.inicios, edad) - 1
+        if i >= 0 and edad <= self.fines[i]:
+            return self.categorias[i]
+        return self.ultima
+
+    def get_categorias(self, edades):
+        """Devuelve la categoría de cada una de las edades indicadas, resolviendo todas a la vez con NumPy."""
+        edades = np.asarray(edades, dtype=np.int64)
+        if not self.categorias:
+            return [self.ultima] * len(edades)
+        indices = np.searchsorted(np.asarray(self.inicios), edades, side='right') - 1
+        validos = (indices >= 0) & (edades <= np.asarray(self.fines)[np.maximum(indices, 0)])
+        opciones = self.categorias + [self.ultima]
+        return [opciones[i] for i in np.where(validos, indices, len(self.categorias)).tolist()]
+
+
+def get_edades(fechas_nacimiento, hoy=None):
+    """
+    Devuelve las edades (en años cumplidos a la fecha indicada o a hoy) de las fechas de nacimiento, calculadas todas
+    a la vez con NumPy. Da el mismo resultado que relativedelta: quien nació un 29 de febrero cumple años el 28 de
+    febrero de los años no bisiestos.
+    """
+    hoy = hoy or date.today()
+    fechas = np.array([(fecha.year, fecha.month * 100 + fecha.day) for fecha in fechas_nacimiento],
+                      dtype=np.int64).reshape(-1, 2)
+    cumpleanos = fechas[:, 1]
+    if not (hoy.year % 4 == 0 and (hoy.year % 100 != 0 or hoy.year % 400 == 0)):
+        cumpleanos = np.where(cumpleanos == 229, 228, cumpleanos)
+    return hoy.year - fechas[:, 0] - (hoy.month * 100 + hoy.day < cumpleanos)
+
+
+def get_resolutor():
+    """
+    Devuelve el resolutor de categorías. Las categorías solo se consultan cuando la versión guardada en la caché
+    compartida cambió, de modo que todos los procesos ven los cambios realizados por cualquiera de ellos.
+    """
+    global _resolutor
+    from socios.models import Categoria
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+        version = cache.get(CLAVE_VERSION)
+    if _resolutor is not None and _resolutor[0] == version:
+        return _resolutor[1]
+    resolutor = ResolutorCategorias(Categoria.objects.all())
+    _resolutor = (version, resolutor)
+    return resolutor
+
+
+def get_categoria_edad(edad):
+    """Devuelve la categoría correspondiente a la edad."""
+    return get_resolutor().get_categoria(edad)
+
+
+def get_categorias_nacimiento(fechas_nacimiento, hoy=None):
+    """Devuelve la categoría correspondiente a cada una de las fechas de nacimiento, en el mismo orden."""
+    return get_resolutor().get_categorias(get_edades(fechas_nacimiento, hoy))
+
+
+def invalidar_categorias(sender, **kwargs):
+    """Cambia la versión de las categorías para que todos los procesos vuelvan a leerlas."""
+    global _resolutor
+    _resolutor = None
+    cache.set(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+
+
+def conectar_categorias():
+    """Conecta la invalidación de la caché a las categorías."""
+    from socios.models import Categoria
+    post_save.connect(invalidar_categorias, sender=Categoria, dispatch_uid='invalidar_categorias')
+    post_delete.connect(invalidar_categorias, sender=Categoria, dispatch_uid='invalidar_borrado_categorias')
@@ -0,0 +1,74 @@
+#  Este archivo contiene la carga en lote de los grupos familiares (titular, miembros y sus socios) para la app socios
+
+from core.models import Persona
+from socios.models import Socio
+
+
+class GrupoFamiliar:
+    """
+    Grupo familiar cargado en memoria: la persona titular y las personas a su cargo (sin las dadas de baja), cada una
+    con su socio en caché, incluso si el socio fue dado de baja. Los métodos de Persona y Socio lo usan cuando está
+    presente, en lugar de consultar la base de datos.
+    """
+
+    def __init__(self, titular, miembros):
+        self.titular = titular
+        self.miembros = miembros
+
+    def get_socios_miembros(self):
+        """Devuelve los socios activos de las personas a cargo, como Socio.get_miembros()."""
+        return [persona.socio for persona in self.miembros if persona.get_socio()]
+
+
+def _get_socio_cacheado(persona):
+    """Devuelve el socio ya cargado en la persona, o None si no hay ninguno en caché."""
+    if Persona.socio.related.is_cached(persona):
+        return Persona.socio.related.get_cached_value(persona)
+    return None
+
+
+def cargar_grupos_familiares(personas):
+    """
+    Carga los grupos familiares completos de las personas indicadas (titulares o miembros) con dos o tres consultas:
+    los titulares que no estén entre las personas indicadas, las personas a cargo de cada titular y los socios de todos
+    ellos. Deja en cada persona el grupo familiar y en caché su socio, su titular y la persona de su socio, de modo que
+    es_titular(), get_socio(), grupo_familiar(), get_miembros(), get_ID_display() y get_related_objects() no vuelvan a
+    consultar la base de datos. Devuelve un diccionario {titular_id: GrupoFamiliar}.
+    """
+    personas = list(personas)
+    cargadas = {persona.pk: persona for persona in personas}
+    titular_ids = {persona.persona_titular_id or persona.pk for persona in cargadas.values()}
+    faltantes = titular_ids - cargadas.keys()
+    if faltantes:
+        # Como persona.persona_titular, los titulares se buscan aunque estén dados de baja.
+        for persona in Persona.global_objects.filter(pk__in=faltantes):
+            cargadas[persona.pk] = persona
+    miembros = {titular_id: [] for titular_id in titular_ids}
+    # Como persona.persona_set, las personas a cargo se buscan sin las dadas de baja.
+    for persona in Persona.objects.filter(persona_titular_id__in=titular_ids).order_by('pk'):
+        persona = cargadas.setdefault(persona.pk, persona)
+        miembros[persona.persona_titular_id].append(persona)
+    socios = {socio.persona_id: socio for socio in Socio.global_objects.filter(persona_id__in=cargadas)}
+    for persona in cargadas.values():
+        socio = _get_socio_cacheado(persona) or socios.get(persona.pk)
+        Persona.socio.related.set_cached_value(persona, socio)
+        if socio is not None:
+            Socio.persona.field.set_cached_value(socio, persona)
+    grupos = {}
+    for titular_id in titular_ids:
+        titular = cargadas.get(titular_id)
+        if titular is None:
+            continue
+        grupo = GrupoFamiliar(titular, miembros[titular_id])
+        titular._grupo_familiar = grupo
+        for persona in grupo.miembros:
+            Persona.persona_titular.field.set_cached_value(persona, titular)
+            persona._grupo_familiar = grupo
+        grupos[titular_id] = grupo
+    # Las personas indicadas que fueron dadas de baja no figuran entre los miembros, pero conocen a su titular.
+    for persona in personas:
+        titular = cargadas.get(persona.persona_titular_id)
+        if titular is not None and not hasattr(persona, '_grupo_familiar'):
+            Persona.persona_titular.field.set_cached_value(persona, titular)
+            persona._grupo_familiar = titular._grupo_familiar
+    return grupos
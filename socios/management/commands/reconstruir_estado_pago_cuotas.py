@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef, F
+
+from socios.models import CuotaSocial, PagoCuotaSocial
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el estado de pago guardado en las cuotas sociales (pagada y fecha y hora de pago) a partir de ' \
+           'sus pagos vigentes, por ejemplo luego de cargar pagos sin pasar por las vistas de cobro.'
+
+    def handle(self, *args, **options):
+        pagos = PagoCuotaSocial.objects.filter(cuotas=OuterRef('pk'))
+        inconsistentes = CuotaSocial.global_objects.annotate(pagos=Exists(pagos)).exclude(pagada=F('pagos')).count()
+        actualizadas = CuotaSocial.global_objects.all().actualizar_estado_pago()
+        self.stdout.write(self.style.SUCCESS('Cuotas sociales actualizadas: {}. Con el estado de pago corregido: '
+                                             '{}.'.format(actualizadas, inconsistentes)))
@@ -0,0 +1,49 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:31
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def calcular_estado_pago(apps, schema_editor):
+    """Guarda el estado de pago de las cuotas sociales existentes a partir de sus pagos vigentes."""
+    CuotaSocial = apps.get_model('socios', 'CuotaSocial')
+    PagoCuotaSocial = apps.get_model('socios', 'PagoCuotaSocial')
+    pagos = PagoCuotaSocial.objects.filter(cuotas=OuterRef('pk'), is_deleted=False).order_by('-pk')
+    CuotaSocial.objects.update(pagada=Exists(pagos), fecha_hora_pago=Subquery(
+        pagos.annotate(fecha=Coalesce('date_approved', 'date_created')).values('fecha')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cuotasocial',
+            name='fecha_hora_pago',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Fecha y hora de pago'),
+        ),
+        migrations.AddField(
+            model_name='cuotasocial',
+            name='pagada',
+            field=models.BooleanField(default=False, editable=False, help_text='Se actualiza al registrar o quitar los pagos de la cuota.', verbose_name='Pagada'),
+        ),
+        migrations.AddField(
+            model_name='historicalcuotasocial',
+            name='fecha_hora_pago',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Fecha y hora de pago'),
+        ),
+        migrations.AddField(
+            model_name='historicalcuotasocial',
+            name='pagada',
+            field=models.BooleanField(default=False, editable=False, help_text='Se actualiza al registrar o quitar los pagos de la cuota.', verbose_name='Pagada'),
+        ),
+        migrations.AddIndex(
+            model_name='cuotasocial',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('pagada', False)), fields=['periodo_anio', 'periodo_mes'], name='cuota_social_pendiente'),
+        ),
+        migrations.RunPython(calcular_estado_pago, migrations.RunPython.noop),
+    ]
@@ -1,17 +1,20 @@
 import locale
 from datetime import datetime
 
-import pytz
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.db.models.functions import Coalesce, ExtractYear, ExtractMonth, Round
 from django.forms import model_to_dict
 from django.urls import reverse
 from django.utils import timezone
-from django_softdelete.models import SoftDeleteModel
+from django_softdelete.models import SoftDeleteModel, SoftDeleteQuerySet
 from num2words import num2words
 from simple_history.models import HistoricalRecords
 
+from core.parameters import get_parameters
+from socios.categories import get_categoria_edad
+
 locale.setlocale(locale.LC_ALL, 'es_AR.UTF-8')
 
 
@@ -77,13 +80,8 @@ class Socio(SoftDeleteModel):
         """
         Devuelve la categoria del socio con base a su edad.
         """
-        for categoria in Categoria.objects.all().order_by('edad_minima'):
-            if categoria.edad_minima <= self.persona.get_edad() <= categoria.edad_maxima:
-                return categoria
-            # En la ultima categoría, si la edad es mayor a la maxima, devolver la ultima categoría
-            if categoria == Categoria.objects.last():
-                return categoria
-        return None
+        # Las categorías se leen de la caché (ver socios.categories), sin consultar la base de datos en cada llamada.
+        return get_categoria_edad(self.persona.get_edad())
 
     def grupo_familiar(self):
         """
@@ -96,6 +94,8 @@ class Socio(SoftDeleteModel):
                 if self.persona.persona_titular.get_socio().is_deleted:
                     return self.persona.persona_titular.get_socio().get_miembros()
                 return [self.persona.persona_titular.socio] + self.persona.persona_titular.socio.get_miembros()
+            if hasattr(self.persona, '_grupo_familiar'):
+                return self.persona._grupo_familiar.get_socios_miembros()
             personas = self.persona.persona_titular.persona_set.exclude(socio__is_deleted=True).exclude(
                 socio__isnull=True)
             return [persona.socio for persona in personas]
@@ -104,6 +104,9 @@ class Socio(SoftDeleteModel):
         """
         Devuelve los socios miembros del titular.
         """
+        # Grupo familiar cargado en memoria por socios.families.cargar_grupos_familiares()
+        if hasattr(self.persona, '_grupo_familiar'):
+            return self.persona._grupo_familiar.get_socios_miembros() if self.persona.es_titular() else []
         personas = self.persona.persona_set.exclude(socio__is_deleted=True).exclude(socio__isnull=True)
         return [persona.socio for persona in personas]
 
@@ -203,6 +206,50 @@ class Categoria(models.Model):
         ]
 
 
+class CuotaSocialQuerySet(SoftDeleteQuerySet):
+    """
+    QuerySet de las cuotas sociales.
+    """
+
+    def with_saldo(self):
+        """
+        Anota en la consulta si la cuota está atrasada, los meses de atraso, el interés por mora y el total a pagar, con
+        el mismo criterio que los métodos de CuotaSocial, que usan estos valores cuando están anotados.
+        """
+        aumento_por_cuota_vencida = get_parameters(Parameters).aumento_por_cuota_vencida
+        ahora = timezone.localtime()
+        atrasada = models.Q(fecha_vencimiento__lt=ahora, pagada=False)
+        return self.annotate(
+            atrasada=models.Case(models.When(atrasada, then=models.Value(True)), default=models.Value(False),
+                                 output_field=models.BooleanField()),
+            meses_de_atraso=models.Case(
+                models.When(atrasada, then=models.Value(ahora.year * 12 + ahora.month) - ExtractYear(
+                    'fecha_vencimiento') * 12 - ExtractMonth('fecha_vencimiento')),
+                default=models.Value(0), output_field=models.IntegerField()),
+        ).annotate(
+            # Se multiplica por el porcentaje ya dividido por 100: en SQLite la división de dos enteros trunca.
+            interes_atraso=Round(models.F('total') * models.Value(aumento_por_cuota_vencida / 100) * models.F(
+                'meses_de_atraso'), 2, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+        ).annotate(
+            saldo=models.ExpressionWrapper(models.F('total') + models.F('cargo_extra') + models.F('interes_atraso'),
+                                           output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+        )
+
+    def actualizar_estado_pago(self):
+        """
+        Recalcula el estado de pago guardado en las cuotas (pagada y fecha_hora_pago) a partir de sus pagos vigentes,
+        con un único UPDATE. Devuelve la cantidad de cuotas actualizadas.
+        """
+        pagos = PagoCuotaSocial.objects.filter(cuotas=models.OuterRef('pk')).order_by('-pk')
+        return self.update(pagada=models.Exists(pagos), fecha_hora_pago=models.Subquery(
+            pagos.annotate(fecha=Coalesce('date_approved', 'date_created')).values('fecha')[:1]))
+
+
+class CuotaSocialManager(models.Manager.from_queryset(CuotaSocialQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class CuotaSocial(SoftDeleteModel):
     """
     Modelo para almacenar las cuotas sociales.
@@ -230,35 +277,46 @@ class CuotaSocial(SoftDeleteModel):
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='Total')
     cargo_extra = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='Cargo extra')
     observaciones = models.TextField(verbose_name='Observaciones', null=True, blank=True)
+    pagada = models.BooleanField(default=False, editable=False, verbose_name='Pagada',
+                                 help_text='Se actualiza al registrar o quitar los pagos de la cuota.')
+    fecha_hora_pago = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Fecha y hora de pago')
     history = HistoricalRecords()
 
+    objects = CuotaSocialManager()
+    global_objects = models.Manager.from_queryset(CuotaSocialQuerySet)()
+
     def is_pagada(self):
-        try:
-            return self.pagocuotasocial_set.exists()
-        except AttributeError:
-            return False
+        return self.pagada
 
     def is_atrasada(self):
-        if self.fecha_vencimiento < datetime.now(
-                pytz.timezone('America/Argentina/Buenos_Aires')) and not self.is_pagada():
+        # Valor anotado por CuotaSocialQuerySet.with_saldo()
+        if hasattr(self, 'atrasada'):
+            return self.atrasada
+        if self.fecha_vencimiento < timezone.localtime() and not self.is_pagada():
             return True
         return False
 
     def meses_atraso(self):
+        if hasattr(self, 'meses_de_atraso'):
+            return self.meses_de_atraso
         if self.is_atrasada():
-            return (datetime.now(pytz.timezone(
-                'America/Argentina/Buenos_Aires')).year - self.fecha_vencimiento.year) * 12 + (
-                    datetime.now(pytz.timezone(
-                        'America/Argentina/Buenos_Aires')).month - self.fecha_vencimiento.month)
+            # Año y mes en la hora local, como en CuotaSocialQuerySet.with_saldo().
+            ahora = timezone.localtime()
+            vencimiento = timezone.localtime(self.fecha_vencimiento)
+            return (ahora.year - vencimiento.year) * 12 + (ahora.month - vencimiento.month)
         return 0
 
     def interes(self):
-        aumento_por_cuota_vencida = Parameters.objects.get(pk=1).aumento_por_cuota_vencida
+        if hasattr(self, 'interes_atraso'):
+            return round(self.interes_atraso, 2) if self.atrasada else 0
+        aumento_por_cuota_vencida = get_parameters(Parameters).aumento_por_cuota_vencida
         if self.is_atrasada():
             return round(self.total * (aumento_por_cuota_vencida / 100) * self.meses_atraso(), 2)
         return 0
 
     def total_a_pagar(self):
+        if hasattr(self, 'saldo'):
+            return round(self.saldo, 2)
         return round(self.total + self.cargo_extra + self.interes(), 2)
 
     def get_estado(self):
@@ -275,7 +333,9 @@ class CuotaSocial(SoftDeleteModel):
         return self.fecha_vencimiento.strftime('%d/%m/%Y') if self.fecha_vencimiento else 'Sin vencimiento'
 
     def get_fecha_pago(self):
-        return self.pagocuotasocial_set.last().fecha_pago.strftime('%d/%m/%Y') if self.is_pagada() else 'Sin pago'
+        if self.pagada and self.fecha_hora_pago:
+            return timezone.localtime(self.fecha_hora_pago).strftime('%d/%m/%Y')
+        return 'Sin pago'
 
     def get_periodo(self):
         return datetime.strptime(f'{self.periodo_anio}-{self.periodo_mes}', '%Y-%m').strftime('%B %Y').capitalize()
@@ -326,6 +386,11 @@ class CuotaSocial(SoftDeleteModel):
         verbose_name = 'Cuota social'
         verbose_name_plural = 'Cuotas sociales'
         unique_together = ('persona', 'periodo_mes', 'periodo_anio')
+        indexes = [
+            # Índice parcial de las cuotas pendientes de pago: los filtros y conteos de pendientes recorren solo estas.
+            models.Index(fields=['periodo_anio', 'periodo_mes'], condition=models.Q(pagada=False, is_deleted=False),
+                         name='cuota_social_pendiente'),
+        ]
         constraints = [
             # Validar que el total sea mayor o igual a 0.
             models.CheckConstraint(check=models.Q(total__gte=0),
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from socios.models import CuotaSocial, PagoCuotaSocial, PagoCuotaSocialCuotas
+
+
+@receiver([post_save, post_delete], sender=PagoCuotaSocialCuotas)
+def actualizar_estado_pago_cuota(sender, instance, **kwargs):
+    """
+    Actualiza el estado de pago guardado en la cuota social al registrar o quitar uno de sus pagos.
+    """
+    CuotaSocial.global_objects.filter(pk=instance.cuota_social_id).actualizar_estado_pago()
+
+
+@receiver(post_save, sender=PagoCuotaSocial)
+def actualizar_estado_pago_cuotas(sender, instance, created, **kwargs):
+    """
+    Actualiza el estado de pago de las cuotas sociales del pago, por ejemplo al darlo de baja o restaurarlo. Un pago
+    recién creado todavía no tiene cuotas.
+    """
+    if not created:
+        CuotaSocial.global_objects.filter(
+            pagocuotasocialcuotas__pago_cuota_social=instance).actualizar_estado_pago()
@@ -7,31 +7,70 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.core.files.storage import FileSystemStorage
 from django.db import transaction
+from django.db.models import OuterRef, Subquery
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import redirect, get_object_or_404
 from django.template.loader import render_to_string
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.formats import date_format
 from django.views.generic import ListView, DetailView, TemplateView
 from num2words import num2words
 from weasyprint import HTML, CSS
 
 from accounts.decorators import admin_required
-from core.models import Club, Persona
+from config.mixins import DataTableMixin
+from core.models import Club
+from core.parameters import get_parameters
 from parameters.models import MedioPago
-from socios.models import CuotaSocial, ItemCuotaSocial, Parameters, PagoCuotaSocial, PagoCuotaSocialCuotas
+from socios.billing import get_cuotas_periodo, generar_cuotas_periodo
+from socios.models import CuotaSocial, Parameters, PagoCuotaSocial, PagoCuotaSocialCuotas
 
 
-class CuotaSocialAdminListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class CuotaSocialAdminListView(LoginRequiredMixin, PermissionRequiredMixin, DataTableMixin, ListView):
     """ Vista para listar las cuotas sociales, solo para administradores """
     model = CuotaSocial
     template_name = 'admin/cuota/list.html'
     permission_required = 'socios.view_cuotasocial'
     context_object_name = 'cuotas_sociales'
+    datatable_values = ['id', 'persona__nombre', 'persona__apellido', 'persona__cuil', 'persona__socio__id',
+                        'periodo_mes', 'periodo_anio', 'saldo', 'fecha_vencimiento', 'is_deleted', 'pagada', 'pago_id']
+    datatable_search_fields = ['id', 'persona__nombre', 'persona__apellido', 'persona__cuil']
+    datatable_order_fields = {
+        'id': 'id',
+        'titular': ['persona__nombre', 'persona__apellido'],
+        'periodo': ['periodo_anio', 'periodo_mes'],
+        'total_a_pagar': 'saldo',
+        'fecha_vencimiento': 'fecha_vencimiento',
+    }
+    datatable_default_order = ['-periodo_anio', '-periodo_mes']
 
     def get_queryset(self):
         # Ordenar las cuotas sociales por periodo, de mas antiguo a mas reciente
         return CuotaSocial.global_objects.all().order_by('periodo_anio', 'periodo_mes')
 
+    def get_datatable_queryset(self):
+        pagos = PagoCuotaSocial.objects.filter(cuotas=OuterRef('pk'))
+        return self.get_queryset().with_saldo().annotate(pago_id=Subquery(pagos.values('pk')[:1]))
+
+    def get_datatable_row(self, row):
+        """Completa la fila con el total a pagar y el estado calculados en la consulta (ver with_saldo())."""
+        cuil = row.pop('persona__cuil')
+        socio_id = row.pop('persona__socio__id')
+        vencimiento = row.pop('fecha_vencimiento')
+        row['titular'] = '{} {} ({}-{}-{})'.format(row.pop('persona__nombre'), row.pop('persona__apellido'),
+                                                   cuil[:2], cuil[2:10], cuil[10:])
+        row['url_socio'] = reverse('admin-socio-detalle', args=[socio_id]) if socio_id else None
+        row['periodo'] = '{}/{}'.format(row.pop('periodo_mes'), row.pop('periodo_anio'))
+        row['total_a_pagar'] = round(row.pop('saldo'), 2)
+        row['fecha_vencimiento'] = date_format(timezone.localtime(vencimiento),
+                                               'DATETIME_FORMAT') if vencimiento else ''
+        row['estado'] = 'Pagada' if row['pagada'] else 'Anulada' if row['is_deleted'] else 'Pendiente'
+        row['url_pdf'] = reverse('cuotas-pdf', args=[row['id']])
+        row['url_anular'] = reverse('admin-cuota-eliminar', args=[row['id']])
+        row['url_comprobante'] = reverse('cuotas-comprobante', args=[row['pago_id']]) if row['pago_id'] else None
+        return row
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Cuotas Sociales'
@@ -45,10 +84,10 @@ class CuotaSocialAdminListView(LoginRequiredMixin, PermissionRequiredMixin, List
                 action = request.POST['action']
                 if action == 'get_total_cuota_social':
                     # Si la acción es get_total_cuota_social, se calcula el total de la cuota social
-                    cuota_social = CuotaSocial.objects.get(pk=request.POST['id'])
+                    cuota_social = CuotaSocial.objects.with_saldo().get(pk=request.POST['id'])
                     # Calcular intereses
                     if cuota_social.is_atrasada():
-                        aumento_por_cuota_vencida = Parameters.objects.get(pk=1).aumento_por_cuota_vencida
+                        aumento_por_cuota_vencida = get_parameters(Parameters).aumento_por_cuota_vencida
                         # Calcular los meses de atraso
                         meses_atraso = cuota_social.meses_atraso()
                         interes = cuota_social.interes()
@@ -128,54 +167,12 @@ class CuotaSocialAdminGenerateView(LoginRequiredMixin, PermissionRequiredMixin,
             messages.error(self.request, 'Debe seleccionar un periodo para generar las cuotas sociales')
             return redirect('admin-cuota-listado')
         context['periodo'] = periodo_mes + '/' + periodo_anio
-        dia_vencimiento_cuota = Parameters.objects.get(pk=1).dia_vencimiento_cuota
+        dia_vencimiento_cuota = get_parameters(Parameters).dia_vencimiento_cuota
         # Filtrar por las personas que sean titulares, que sean socios o que tengan almenos un miembro como socio
         # creado antes del periodo seleccionado y que no tengan una cuota social generada para el periodo
-        # seleccionado.
+        # seleccionado. Las cuotas se calculan en lote (ver socios.billing).
         personas_json = []
-        persona_validas = Persona.objects.filter(
-            persona_titular__isnull=True
-        ).exclude(
-            cuotasocial__periodo_mes=periodo_mes, cuotasocial__periodo_anio=periodo_anio
-        )
-        for persona in persona_validas:
-            if not persona.get_socio() and persona.persona_set.all().count() == 0:
-                persona_validas = persona_validas.exclude(pk=persona.pk)
-                continue
-            # Quitamos las personas que no son socios y no tienen ninguna persona a cargo.
-
-            if not persona.get_socio() and persona.persona_set.all().count() > 0:
-                socio = 0
-                for miembro in persona.persona_set.all():
-                    if miembro.get_socio() and miembro.get_socio().date_created <= \
-                            datetime(int(periodo_anio), int(periodo_mes), 1, tzinfo=pytz.timezone(settings.TIME_ZONE)):
-                        socio += 1
-                if socio == 0:
-                    persona_validas = persona_validas.exclude(pk=persona.pk)
-                    continue
-            # Quitamos las personas que no son socios y tienen personas a cargo, pero ninguna de ellas
-            # son socios activos o son socios creados antes del periodo seleccionado.
-
-            if persona.get_socio() and persona.socio.grupo_familiar().__len__() == 1:
-                if persona.socio.date_created > datetime(int(periodo_anio), int(periodo_mes), 1,
-                                                         tzinfo=pytz.timezone(settings.TIME_ZONE)):
-                    persona_validas = persona_validas.exclude(pk=persona.pk)
-                    continue
-            # Quitamos las personas que son socios y no tienen personas a cargo, pero el socio fue creado
-            # después del periodo seleccionado.
-
-            if persona.get_socio() and persona.socio.grupo_familiar().__len__() > 1:
-                socio = 0
-                for miembro in persona.socio.grupo_familiar():
-                    if not miembro.is_deleted and miembro.date_created <= \
-                            datetime(int(periodo_anio), int(periodo_mes), 1, tzinfo=pytz.timezone(settings.TIME_ZONE)):
-                        socio += 1
-                if socio == 0:
-                    persona_validas = persona_validas.exclude(pk=persona.pk)
-                    continue
-            # Quitamos las personas que son socios y tienen personas a cargo, pero ninguna de ellas
-            # son socios activos o son socios creados antes del periodo seleccionado.
-
+        for persona, items in get_cuotas_periodo(periodo_mes, periodo_anio).values():
             # Crear la cuota social en formato json para ser utilizada en el template
             persona.cuota_social = {
                 'persona': persona.pk,
@@ -184,32 +181,15 @@ class CuotaSocialAdminGenerateView(LoginRequiredMixin, PermissionRequiredMixin,
                 'periodo_anio': periodo_anio,
                 'fecha_vencimiento': datetime(int(periodo_anio), int(periodo_mes), dia_vencimiento_cuota).strftime(
                     '%d/%m/%Y'),
-                'items': []
+                'items': [{
+                    'socio': item['socio'].pk,
+                    'nombre_completo': item['nombre_completo'],
+                    'categoria': item['categoria'].__str__(),
+                    'cuota': item['cuota'].__str__(),
+                    'cargo_extra': 0,
+                    'total_parcial': item['cuota'].__str__()
+                } for item in items]
             }
-            # Agregar los items de la cuota social
-            if persona.get_socio():
-                for miembro in persona.socio.grupo_familiar():
-                    persona.cuota_social['items'].append({
-                        'socio': miembro.pk,
-                        'nombre_completo': miembro.persona.get_full_name(),
-                        'categoria': miembro.get_categoria().__str__(),
-                        'cuota': miembro.get_categoria().cuota.__str__(),
-                        'cargo_extra': 0,
-                        'total_parcial': miembro.get_categoria().cuota.__str__()
-                    })
-            else:
-                for miembro in persona.persona_set.all():
-                    if miembro.get_socio() and miembro.get_socio().date_created <= \
-                            datetime(int(periodo_anio), int(periodo_mes), 1, tzinfo=pytz.timezone(settings.TIME_ZONE)):
-                        persona.cuota_social['items'].append({
-                            'socio': miembro.pk,
-                            'nombre_completo': miembro.get_full_name(),
-                            'categoria': miembro.socio.get_categoria().__str__(),
-                            'cuota': miembro.socio.get_categoria().cuota.__str__(),
-                            'cargo_extra': 0,
-                            'total_parcial': miembro.socio.get_categoria().cuota.__str__()
-                        })
-
             # Agregar el total de la cuota social
             total = 0
             for item in persona.cuota_social['items']:
@@ -227,51 +207,15 @@ class CuotaSocialAdminGenerateView(LoginRequiredMixin, PermissionRequiredMixin,
         data = {}
         try:
             # Obtener las ids de las personas seleccionadas
-            personas = Persona.objects.filter(pk__in=request.POST.getlist('ids[]'))
+            personas = request.POST.getlist('ids[]')
             # Obtener el periodo de las cuotas sociales
             periodo = request.POST.get('periodo')
             periodo_mes, periodo_anio = periodo.split('/')
-            dia_vencimiento_cuota = Parameters.objects.get(pk=1).dia_vencimiento_cuota
-            # Crear las cuotas sociales
-            for persona in personas:
-                with transaction.atomic():
-                    cuota = CuotaSocial.objects.create(
-                        persona=persona,
-                        fecha_emision=timezone.now(),
-                        fecha_vencimiento=datetime(int(periodo_anio), int(periodo_mes), dia_vencimiento_cuota,
-                                                   0, 0, 0, 0),
-                        # TODO: Parametrizar el vencimiento de las cuotas sociales
-                        periodo_mes=periodo_mes,
-                        periodo_anio=periodo_anio,
-                    )
-                    # Crear los items de la cuota social
-                    if persona.get_socio():
-                        for miembro in persona.socio.grupo_familiar():
-                            ItemCuotaSocial.objects.create(
-                                cuota_social=cuota,
-                                socio=miembro,
-                                nombre_completo=miembro.persona.get_full_name(),
-                                categoria=miembro.get_categoria(),
-                                cuota=miembro.get_categoria().cuota,
-                            )
-                    else:
-                        for miembro in persona.persona_set.all():
-                            if miembro.get_socio() and miembro.get_socio().date_created <= \
-                                    datetime(int(periodo_anio), int(periodo_mes), 1,
-                                             tzinfo=pytz.timezone(settings.TIME_ZONE)):
-                                ItemCuotaSocial.objects.create(
-                                    cuota_social=cuota,
-                                    socio=miembro,
-                                    nombre_completo=miembro.get_full_name(),
-                                    categoria=miembro.socio.get_categoria(),
-                                    cuota=miembro.socio.get_categoria().cuota,
-                                )
-                    # Crear el total de la cuota social
-                    total = 0
-                    for item in cuota.itemcuotasocial_set.all():
-                        total += item.cuota.__float__()
-                    cuota.total = total
-                    cuota.save()
+            dia_vencimiento_cuota = get_parameters(Parameters).dia_vencimiento_cuota
+            # Crear las cuotas sociales y sus items en lote
+            # TODO: Parametrizar el vencimiento de las cuotas sociales
+            generar_cuotas_periodo(int(periodo_mes), int(periodo_anio), timezone.make_aware(
+                datetime(int(periodo_anio), int(periodo_mes), dia_vencimiento_cuota)), personas)
             messages.success(request, 'Cuotas sociales generadas correctamente')
         except Exception as e:
             data['error'] = e.args[0]
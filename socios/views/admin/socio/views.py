@@ -1,3 +1,6 @@
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
@@ -11,7 +14,7 @@ from django.db import transaction
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import redirect
 from django.template.loader import render_to_string
-from django.urls import reverse_lazy
+from django.urls import reverse_lazy, reverse
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
 from django.views.generic import ListView, DetailView, UpdateView, CreateView, DeleteView, FormView
@@ -19,22 +22,60 @@ from weasyprint import HTML, CSS
 
 from accounts.decorators import admin_required
 from accounts.forms import *
+from config.mixins import DataTableMixin
 from core.models import Club, Persona
 from parameters.models import MedioPago
 from socios.forms import SocioAdminForm, SocioParametersForm
+from socios.categories import get_resolutor
+from socios.families import cargar_grupos_familiares
 from socios.models import Socio, Parameters, CuotaSocial
 
 
-class SocioAdminListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class SocioAdminListView(LoginRequiredMixin, PermissionRequiredMixin, DataTableMixin, ListView):
     """ Vista para listar los socios """
     model = Socio
     template_name = 'admin/socio/list.html'
     permission_required = 'socios.view_socio'
     context_object_name = 'socios'
+    datatable_values = ['id', 'persona__cuil', 'persona__nombre', 'persona__apellido', 'persona__fecha_nacimiento',
+                        'persona__persona_titular_id', 'persona__persona_titular__socio__id', 'is_deleted']
+    datatable_search_fields = ['id', 'persona__cuil', 'persona__nombre', 'persona__apellido']
+    datatable_order_fields = {
+        'ficha': 'id',
+        'cuil': 'persona__cuil',
+        'nombre_completo': ['persona__nombre', 'persona__apellido'],
+        'edad': '-persona__fecha_nacimiento',
+        'estado': 'is_deleted',
+    }
+    datatable_default_order = ['-id']
 
     def get_queryset(self):
         return Socio.global_objects.all()
 
+    def get_datatable_data(self, params):
+        data = super().get_datatable_data(params)
+        # Las categorías de la página se resuelven en lote, a partir de las edades ya calculadas.
+        for row, categoria in zip(data['data'], get_resolutor().get_categorias([row['edad'] for row in data['data']])):
+            row['categoria'] = str(categoria or '')
+        return data
+
+    def get_datatable_row(self, row):
+        cuil = row.pop('persona__cuil')
+        edad = relativedelta(datetime.now(), row.pop('persona__fecha_nacimiento')).years
+        socio_titular = row.pop('persona__persona_titular__socio__id')
+        if row.pop('persona__persona_titular_id') is None or socio_titular is None:
+            row['ficha'] = row['id']
+        else:
+            row['ficha'] = '{}-{}'.format(socio_titular, row['id'])
+        row['cuil'] = cuil[:2] + '-' + cuil[2:10] + '-' + cuil[10:]
+        row['nombre_completo'] = row.pop('persona__nombre') + ' ' + row.pop('persona__apellido')
+        row['edad'] = edad
+        row['estado'] = 'Inactivo' if row['is_deleted'] else 'Activo'
+        row['url_detalle'] = reverse('admin-socio-detalle', args=[row['id']])
+        row['url_editar'] = reverse('admin-socio-editar', args=[row['id']])
+        row['url_baja'] = reverse('admin-socio-baja', args=[row['id']])
+        return row
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Listado de Socios'
@@ -145,13 +186,16 @@ class SocioAdminDetailView(LoginRequiredMixin, PermissionRequiredMixin, DetailVi
         context = super().get_context_data(**kwargs)
         context['title'] = 'Detalle de Socio'
         context['cuotas_sociales'] = CuotaSocial.objects.filter(
-            itemcuotasocial__socio=self.get_object()
-        ).order_by('periodo_anio', 'periodo_mes')
+            itemcuotasocial__socio=self.object
+        ).with_saldo().select_related('persona__socio').order_by('periodo_anio', 'periodo_mes')
         context['medios_pagos'] = MedioPago.objects.all()
         return context
 
     def get_object(self, queryset=None):
-        return Socio.global_objects.get(pk=self.kwargs['pk'])
+        socio = Socio.global_objects.select_related('persona').get(pk=self.kwargs['pk'])
+        # El grupo familiar se carga en lote: el template recorre los miembros con su ficha y su categoría.
+        cargar_grupos_familiares([socio.persona])
+        return socio
 
 
 class SocioAdminUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
@@ -263,6 +307,12 @@ class SocioAdminDeleteView(LoginRequiredMixin, PermissionRequiredMixin, DeleteVi
     permission_required = 'socios.delete_socio'
     context_object_name = 'socio'
 
+    def get_object(self, queryset=None):
+        socio = super().get_object(Socio.objects.select_related('persona'))
+        # El grupo familiar se carga en lote, para listar los miembros y darlos de baja en cascada.
+        cargar_grupos_familiares([socio.persona])
+        return socio
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Baja de Socio'
@@ -331,6 +381,11 @@ class SocioAdminDetailPrintView(LoginRequiredMixin, PermissionRequiredMixin, Det
     permission_required = 'socios.view_socio'
     context_object_name = 'socio'
 
+    def get_object(self, queryset=None):
+        socio = super().get_object(Socio.objects.select_related('persona'))
+        cargar_grupos_familiares([socio.persona])
+        return socio
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Detalle de Socio'
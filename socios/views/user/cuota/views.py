@@ -46,8 +46,8 @@ class CuotaSocialUserListView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         # Filtrar las cuotas sociales pendientes del socio autenticado, ordenadas por periodo
         return CuotaSocial.objects.filter(
-            itemcuotasocial__socio=self.request.user.socio
-        ).exclude(pagocuotasocialcuotas__isnull=False).order_by('periodo_anio', 'periodo_mes')
+            itemcuotasocial__socio=self.request.user.socio, pagada=False
+        ).with_saldo().order_by('periodo_anio', 'periodo_mes')
 
     def post(self, request, *args, **kwargs):
         data = {}
@@ -85,7 +85,7 @@ class CuotaSocialUserOrderView(LoginRequiredMixin, TemplateView):
         context = super(CuotaSocialUserOrderView, self).get_context_data(**kwargs)
         context['title'] = 'Orden de Pago'
         context['club_logo'] = Club.objects.get(pk=1).get_imagen()
-        context['cuotas'] = CuotaSocial.objects.filter(pk__in=self.request.session['cuotas'])
+        context['cuotas'] = CuotaSocial.objects.filter(pk__in=self.request.session['cuotas']).with_saldo()
         subtotal = 0
         interes = 0
         for cuota in context['cuotas']:
@@ -102,7 +102,7 @@ class CuotaSocialUserOrderView(LoginRequiredMixin, TemplateView):
         data = {}
         try:
             # Crear el checkout de mercadopago con las cuotas seleccionadas en session
-            cuotas = CuotaSocial.objects.filter(pk__in=request.session['cuotas'])
+            cuotas = CuotaSocial.objects.filter(pk__in=request.session['cuotas']).with_saldo()
             total = 0
             for cuota in cuotas:
                 if cuota.is_pagada():
@@ -166,39 +166,31 @@ class CuotaSocialUserCheckoutView(View):
                         # Obtener el id de la cuota social con external_reference
                         external_references = request.GET['external_reference']
                         ids = [int(id.strip()) for id in external_references.strip('[]').split(',')]
-                        cuotas = CuotaSocial.objects.filter(pk__in=ids)
+                        cuotas = list(CuotaSocial.objects.filter(pk__in=ids).with_saldo())
                         payment_info = sdk.payment().get(request.GET['payment_id'])
                         # Con todas las cuotas, crear solo un pago de cuota social
                         pago = PagoCuotaSocial.objects.create(
                             medio_pago="MercadoPago",
                             fecha_pago=datetime.now(pytz.timezone('America/Argentina/Buenos_Aires')),
-                            subtotal=0,
-                            interes_aplicado=0,
-                            total_pagado=payment_info['response']['transaction_amount'],
+                            subtotal=sum(cuota.total for cuota in cuotas),
+                            interes_aplicado=sum(cuota.interes() for cuota in cuotas),
+                            total_pagado=sum(cuota.total_a_pagar() for cuota in cuotas),
                             payment_id=request.GET['payment_id'],
                             status=payment_info['response']['status'],
                             status_detail=payment_info['response']['status_detail'],
                             date_approved=payment_info['response']['date_approved'],
                         )
-                        subtotal = 0
-                        interes = 0
-                        total = 0
-                        for cuota in cuotas:
-                            subtotal += cuota.total
-                            interes += cuota.interes()
-                            total += cuota.total_a_pagar()
-                            # pago.cuotas.add(cuota), no puedo hacer esto porque hay una tabla intermedia con mas campos
-                            PagoCuotaSocialCuotas.objects.create(
+                        # pago.cuotas.add(cuota), no puedo hacer esto porque hay una tabla intermedia con mas campos
+                        PagoCuotaSocialCuotas.objects.bulk_create([
+                            PagoCuotaSocialCuotas(
                                 pago_cuota_social=pago,
                                 cuota_social=cuota,
                                 interes_aplicado=cuota.interes(),
                                 subtotal=cuota.total,
                                 total_pagado=cuota.total_a_pagar()
-                            )
-                        pago.subtotal = subtotal
-                        pago.interes_aplicado = interes
-                        pago.total_pagado = total
-                        pago.save()
+                            ) for cuota in cuotas])
+                        # bulk_create no envía señales: se actualiza el estado de pago de las cuotas en un solo UPDATE
+                        CuotaSocial.global_objects.filter(pk__in=[cuota.pk for cuota in cuotas]).actualizar_estado_pago()
                     messages.success(request, 'Pago realizado con éxito.')
                     return redirect('cuotas-comprobante', pk=pago.pk)
                 else: